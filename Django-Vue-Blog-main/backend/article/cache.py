@@ -0,0 +1,212 @@
+"""
+只读接口的响应缓存
+
+缓存键包含相关资源的“代”（generation），模型变化时由 signals 更新对应的代，
+旧缓存条目自然失效，无需按 TTL 猜测或逐条删除。
+
+* 代保存在 Django 缓存中，多进程部署时应配置共享缓存（Redis / Memcached）
+* 响应内容可以存放在进程内 LRU 或 Django 缓存，由 settings.RESPONSE_CACHE 配置
+* 只缓存匿名用户、JSON 格式、状态码 200 的 GET 响应
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.renderers import JSONRenderer
+
+from article.lru import LRUCache
+
+GENERATION_PREFIX = 'article:generation:'
+RESPONSE_PREFIX = 'article:response:'
+
+DEFAULT_SETTINGS = {
+    'BACKEND': 'local',   # local: 进程内 LRU；django: Django 缓存
+    'CACHE_ALIAS': 'default',
+    'MAX_ENTRIES': 1000,
+    'TIMEOUT': 60 * 10,
+}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'RESPONSE_CACHE', {})}
+
+
+def get_generations(*scopes):
+    """
+    读取各资源当前的代，不存在时生成随机值
+
+    使用随机值而不是自增计数，代被缓存淘汰后也不会与旧条目的键重合。
+    """
+    keys = [GENERATION_PREFIX + scope for scope in scopes]
+    values = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        value = values.get(key)
+        if value is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            value = cache.get(key)
+        generations.append(value)
+    return generations
+
+
+def bump(*scopes):
+    """
+    使相关资源的缓存失效
+    """
+    cache.set_many(
+        {GENERATION_PREFIX + scope: uuid.uuid4().hex for scope in scopes},
+        None
+    )
+
+
+class LocalResponseCache:
+    """
+    进程内 LRU，条目带过期时间
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.timeout = timeout
+        self._cache = LRUCache(maxsize=max_entries)
+
+    def get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            self._cache.delete(key)
+            return None
+        return value
+
+    def set(self, key, value):
+        self._cache.set(key, (time.monotonic() + self.timeout, value))
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DjangoResponseCache:
+    """
+    使用 Django 缓存保存响应，多个进程共享
+    """
+
+    def __init__(self, alias, timeout):
+        self.alias = alias
+        self.timeout = timeout
+
+    def get(self, key):
+        return caches[self.alias].get(key)
+
+    def set(self, key, value):
+        caches[self.alias].set(key, value, self.timeout)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        config = get_settings()
+        if config['BACKEND'] == 'django':
+            _backend = DjangoResponseCache(config['CACHE_ALIAS'], config['TIMEOUT'])
+        else:
+            _backend = LocalResponseCache(config['MAX_ENTRIES'], config['TIMEOUT'])
+    return _backend
+
+
+def is_cacheable(request):
+    if request.method != 'GET' or request.user.is_authenticated:
+        return False
+    renderer = getattr(request, 'accepted_renderer', None)
+    return isinstance(renderer, JSONRenderer)
+
+
+def response_key(request, scopes):
+    generations = get_generations(*scopes)
+    raw = '|'.join([request.get_full_path(), request.accepted_media_type, *generations])
+    return RESPONSE_PREFIX + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def object_scope(name, pk):
+    """
+    单个对象的资源名，pk 不是整数时返回 None（不缓存），避免 01 与 1 对应不同的键
+    """
+    try:
+        return f'{name}:{int(pk)}'
+    except (TypeError, ValueError):
+        return None
+
+
+def cached_response(request, scopes, handler):
+    """
+    命中缓存时直接返回（并支持条件请求），否则调用 handler 并缓存渲染后的内容
+    """
+    if scopes is None or not is_cacheable(request):
+        return handler()
+
+    backend = get_backend()
+    key = response_key(request, scopes)
+    entry = backend.get(key)
+    if entry is not None:
+        content, content_type, headers = entry
+        not_modified = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+        )
+        if not_modified is not None:
+            return not_modified
+        response = HttpResponse(content, content_type=content_type)
+        for name, value in headers.items():
+            response.headers[name] = value
+        return response
+
+    response = handler()
+    if response.status_code != 200 or not hasattr(response, 'data'):
+        return response
+
+    response.accepted_renderer = request.accepted_renderer
+    response.accepted_media_type = request.accepted_media_type
+    response.renderer_context = {'request': request, 'response': response}
+    response.render()
+    headers = {
+        name: response.headers[name]
+        for name in ('ETag', 'Last-Modified')
+        if name in response.headers
+    }
+    backend.set(key, (response.content, response['Content-Type'], headers))
+    return response
+
+
+class ResponseCacheMixin:
+    """
+    为视图集的 list / retrieve 增加响应缓存
+
+    子类实现 get_cache_scopes(**kwargs) 返回响应依赖的资源列表，返回 None 表示不缓存。
+    """
+
+    def get_cache_scopes(self, **kwargs):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            request,
+            self.get_cache_scopes(**kwargs),
+            lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            request,
+            self.get_cache_scopes(**kwargs),
+            lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs)
+        )
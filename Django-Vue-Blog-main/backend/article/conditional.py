@@ -0,0 +1,81 @@
+"""
+条件请求（ETag / Last-Modified）
+
+先用一次轻量的元数据查询（更新时间、计数等）或响应缓存的代计算校验值，
+命中 If-None-Match / If-Modified-Since 时直接返回 304，不再序列化或渲染。
+
+文章列表的 ETag 由缓存的代计算，不查询文章表。响应中包含计数的接口不提供 Last-Modified：
+计数通过 F() 更新、删除评论都不会改变更新时间，Last-Modified 无法反映这些变化。
+同时携带两者时以 If-None-Match 为准（RFC 7232）。
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def compute_etag(request, *parts):
+    """
+    由请求路径、响应格式和元数据计算弱 ETag
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = '|'.join([
+        request.get_full_path(),
+        getattr(renderer, 'format', ''),
+        *[str(part) for part in parts],
+    ])
+    return 'W/' + quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+
+def conditional_response(request, handler, etag=None, last_modified=None):
+    """
+    未修改时返回 304，否则调用 handler 生成响应并附加校验头
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        return response
+
+    response = handler()
+    if response.status_code == 200:
+        if etag:
+            response.headers.setdefault('ETag', etag)
+        if timestamp:
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    为视图集的 list / retrieve 增加条件请求支持
+
+    子类实现 get_conditional_meta(request, **kwargs)，返回 (元数据元组, 最后修改时间)，
+    返回 None 表示不做条件判断（例如对象不存在，交给正常流程返回 404）。
+    """
+
+    def get_conditional_meta(self, request, **kwargs):
+        return None
+
+    def conditional(self, request, handler, **kwargs):
+        meta = self.get_conditional_meta(request, **kwargs)
+        if meta is None:
+            return handler()
+        parts, last_modified = meta
+        return conditional_response(
+            request,
+            handler,
+            etag=compute_etag(request, *parts),
+            last_modified=last_modified,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            request,
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+            **kwargs
+        )
@@ -0,0 +1,128 @@
+"""
+文章的点赞数、阅读数、评论数
+
+计数冗余保存在 Article 上，通过 F() 原子增减，读取时不再 COUNT(*)。
+settings.ARTICLE_COUNTER_SHARDS 大于 0 时，增量写入随机的 ArticleCounterShard 行，
+热门文章的并发更新分散到多行，Article 上的计数在 fold_shards() 之后更新。
+"""
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from article.models import Article, ArticleCounterShard, ArticleLike, ArticleView, ArticleViewDaily
+from comment.models import Comment
+
+COUNTER_FIELDS = Article.COUNTER_FIELDS
+
+
+def get_shard_count():
+    return getattr(settings, 'ARTICLE_COUNTER_SHARDS', 0)
+
+
+def add_expression(field, amount):
+    """
+    计数加上 amount，结果不低于 0
+
+    先比较再相减，避免 MySQL 无符号列相减为负数时报错
+    """
+    if amount >= 0:
+        return F(field) + amount
+    return Case(
+        When(**{f'{field}__gte': -amount}, then=F(field) + amount),
+        default=Value(0),
+    )
+
+
+def increment(article_id, field, amount=1):
+    """
+    原子地增减文章计数
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f'Unknown counter: {field}')
+    if not amount:
+        return
+
+    shards = get_shard_count()
+    if not shards:
+        Article.objects.filter(pk=article_id).update(**{field: add_expression(field, amount)})
+        return
+
+    shard = random.randrange(shards)
+    updated = ArticleCounterShard.objects.filter(article_id=article_id, shard=shard).update(
+        **{field: F(field) + amount}
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            ArticleCounterShard.objects.create(article_id=article_id, shard=shard, **{field: amount})
+    except IntegrityError:
+        # 并发创建了同一分片，改为更新
+        ArticleCounterShard.objects.filter(article_id=article_id, shard=shard).update(
+            **{field: F(field) + amount}
+        )
+
+
+def fold_shards():
+    """
+    把分片中的增量合并到 Article，返回处理的文章 id 列表
+    """
+    article_ids = list(
+        ArticleCounterShard.objects.values_list('article_id', flat=True).distinct()
+    )
+    for article_id in article_ids:
+        with transaction.atomic():
+            shards = list(
+                ArticleCounterShard.objects.select_for_update().filter(article_id=article_id)
+            )
+            updates = {}
+            for field in COUNTER_FIELDS:
+                total = sum(getattr(shard, field) for shard in shards)
+                if total:
+                    updates[field] = add_expression(field, total)
+            if updates:
+                Article.objects.filter(pk=article_id).update(**updates)
+            ArticleCounterShard.objects.filter(pk__in=[shard.pk for shard in shards]).delete()
+    return article_ids
+
+
+def aggregate_subquery(model, aggregate, field='article'):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=aggregate)
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def reconcile(article_ids=None):
+    """
+    从点赞、阅读、评论表重新计算计数，并清空分片，返回更新的文章数
+
+    阅读量为已汇总到 ArticleViewDaily 的部分加上尚未汇总的原始记录
+    """
+    articles = Article.objects.all()
+    shards = ArticleCounterShard.objects.all()
+    if article_ids is not None:
+        articles = articles.filter(pk__in=article_ids)
+        shards = shards.filter(article_id__in=article_ids)
+
+    with transaction.atomic():
+        shards.delete()
+        return articles.update(
+            likes_count=aggregate_subquery(ArticleLike, Count('pk')),
+            views_count=(
+                aggregate_subquery(ArticleView, Count('pk'))
+                + aggregate_subquery(ArticleViewDaily, Sum('views'))
+            ),
+            comments_count=aggregate_subquery(Comment, Count('pk')),
+        )
+
@@ -0,0 +1,58 @@
+"""
+代码块高亮缓存
+
+codehilite 每次渲染都会对所有代码块重新执行 Pygments 词法分析和 HTML 格式化。
+这里以 (语言, 代码哈希, 格式化选项) 为键缓存高亮结果，
+文章编辑后重新渲染时只有改动过的代码块才会重新高亮。
+
+与 rendering 模块一样不依赖 Django，缓存在每个进程内独立存在。
+"""
+import hashlib
+
+from markdown.extensions import codehilite, fenced_code
+
+from article.lru import LRUCache
+
+HIGHLIGHT_CACHE_SIZE = 2048
+
+highlight_cache = LRUCache(maxsize=HIGHLIGHT_CACHE_SIZE)
+
+
+class CachedCodeHilite(codehilite.CodeHilite):
+    """
+    带缓存的 CodeHilite
+    """
+
+    def cache_key(self, shebang):
+        src = self.src.strip('\n')
+        options = tuple(sorted(
+            (name, repr(value)) for name, value in self.options.items()
+        ))
+        return (
+            self.lang,
+            hashlib.sha256(src.encode('utf-8')).hexdigest(),
+            shebang,
+            self.guess_lang,
+            self.use_pygments,
+            self.lang_prefix,
+            repr(self.pygments_formatter),
+            options,
+        )
+
+    def hilite(self, shebang=True):
+        key = self.cache_key(shebang)
+        html = highlight_cache.get(key)
+        if html is None:
+            html = super().hilite(shebang)
+            highlight_cache.set(key, html)
+        return html
+
+
+def install():
+    """
+    让 codehilite 与 fenced_code 扩展使用带缓存的 CodeHilite
+
+    两个扩展都直接引用模块级的 CodeHilite，因此替换模块属性即可，可重复调用。
+    """
+    codehilite.CodeHilite = CachedCodeHilite
+    fenced_code.CodeHilite = CachedCodeHilite
@@ -0,0 +1,75 @@
+"""
+HyperLogLog 基数估计
+
+用 2^PRECISION 个寄存器（每个 1 字节）估计不重复元素的个数，
+相对标准误差约为 1.04 / sqrt(2^PRECISION)，PRECISION = 12 时约 1.6%。
+两个草图逐寄存器取最大值即为并集，可以把每天的草图合并为任意日期范围。
+
+序列化时用 zlib 压缩，访客少时大部分寄存器为 0，存储只有几十字节。
+"""
+import hashlib
+import math
+import zlib
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_RANK_BITS = 64 - PRECISION
+
+
+def hash_value(value):
+    """
+    把访客标识映射为 64 位整数
+    """
+    digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 草图
+    """
+
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers else bytearray(REGISTERS)
+
+    @classmethod
+    def load(cls, data):
+        """
+        从 dump() 的结果恢复，空值表示空草图
+        """
+        if not data:
+            return cls()
+        registers = zlib.decompress(bytes(data))
+        if len(registers) != REGISTERS:
+            raise ValueError('Sketch precision mismatch')
+        return cls(registers)
+
+    def dump(self):
+        return zlib.compress(bytes(self.registers))
+
+    def add_hash(self, value):
+        index = value >> _RANK_BITS
+        rest = value & ((1 << _RANK_BITS) - 1)
+        rank = _RANK_BITS - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value):
+        self.add_hash(hash_value(value))
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        zeros = self.registers.count(0)
+        if zeros == REGISTERS:
+            return 0
+        raw = _ALPHA * REGISTERS * REGISTERS / sum(2.0 ** -rank for rank in self.registers)
+        # 基数较小时改用线性计数
+        if raw <= 2.5 * REGISTERS and zeros:
+            return round(REGISTERS * math.log(REGISTERS / zeros))
+        return round(raw)
@@ -0,0 +1,212 @@
+"""
+封面图的缩放版本
+
+文章列表和头像直接使用原图会浪费大量带宽。封面图上传后按 settings.COVER_IMAGE_VARIANTS
+中的宽度缩放，分别压缩为 WebP 与 JPEG，记录在 CoverImageVariant 中，接口返回各版本的地址。
+
+* 生成在事务提交后交给线程池执行，不占用请求线程；Pillow 解码、缩放、编码时释放 GIL
+* 只缩小不放大，原图窄于目标宽度时保持原尺寸，只重新压缩
+* 原图替换后（文件名变化）重新生成，旧版本的文件随之删除
+* 已有的封面图用 generate_cover_variants 命令补齐
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from article.cache import bump
+from article.models import CoverImage, CoverImageVariant
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'WIDTHS': {             # 版本名: 最大宽度
+        'thumb': 320,
+        'small': 640,
+        'large': 1280,
+    },
+    'FORMATS': {            # 格式: 压缩质量
+        'webp': 80,
+        'jpeg': 82,
+    },
+    'WORKERS': 2,           # 生成线程数
+    'ASYNC': True,          # False 时在保存封面图的线程中同步生成
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'COVER_IMAGE_VARIANTS', {})}
+
+
+def get_executor():
+    """
+    懒加载的生成线程池
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_settings()['WORKERS'],
+                thread_name_prefix='cover-variants',
+            )
+        return _executor
+
+
+def resize(image, width):
+    """
+    等比缩小到不超过 width 宽
+    """
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def encode(image, image_format, quality):
+    """
+    把 Pillow 图像编码为 WebP 或 JPEG
+    """
+    if image_format == 'jpeg':
+        if image.mode in ('RGBA', 'LA'):
+            # JPEG 不支持透明，铺在白色背景上
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        options = {'quality': quality, 'optimize': True, 'progressive': True}
+    else:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        options = {'quality': quality, 'method': 4}
+
+    buffer = BytesIO()
+    image.save(buffer, format=image_format.upper(), **options)
+    return buffer.getvalue()
+
+
+def load_image(cover, max_width):
+    """
+    读取原图，按 EXIF 方向旋转，调色板图像转换为 RGBA
+
+    JPEG 原图用 draft 模式在解码时直接缩小（长宽都不小于 max_width，旋转后宽度仍然足够），
+    大尺寸照片的解码时间和内存明显减少
+    """
+    with cover.content.open('rb') as file:
+        image = Image.open(file)
+        image.draft('RGB', (max_width, max_width))
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('P', 'PA'):
+        image = image.convert('RGBA')
+    elif image.mode in ('I;16', 'I', 'F'):
+        image = image.convert('RGB')
+    return image
+
+
+def is_current(cover, variants):
+    config = get_settings()
+    expected = {(name, image_format) for name in config['WIDTHS'] for image_format in config['FORMATS']}
+    return (
+        {(variant.name, variant.format) for variant in variants} == expected
+        and all(variant.source == cover.content.name for variant in variants)
+    )
+
+
+def generate_variants(image_id, force=False):
+    """
+    生成封面图的全部版本，返回生成的数量；版本已是最新时（除非 force）或原图无法识别时返回 0
+    """
+    cover = CoverImage.objects.filter(pk=image_id).first()
+    if cover is None or not cover.content:
+        return 0
+    existing = list(cover.variants.all())
+    if not force and existing and is_current(cover, existing):
+        return 0
+
+    config = get_settings()
+    try:
+        image = load_image(cover, max(config['WIDTHS'].values()))
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.warning('Cannot generate variants for cover image %s', image_id, exc_info=True)
+        return 0
+
+    stem = os.path.splitext(os.path.basename(cover.content.name))[0]
+    variants = []
+    for name, width in config['WIDTHS'].items():
+        resized = resize(image, width)
+        for image_format, quality in config['FORMATS'].items():
+            data = encode(resized, image_format, quality)
+            variant = CoverImageVariant(
+                image=cover,
+                name=name,
+                format=image_format,
+                width=resized.width,
+                height=resized.height,
+                source=cover.content.name,
+            )
+            variant.content.save(
+                f'{stem}_{name}.{EXTENSIONS[image_format]}', ContentFile(data), save=False
+            )
+            variants.append(variant)
+
+    try:
+        with transaction.atomic():
+            CoverImageVariant.objects.filter(pk__in=[variant.pk for variant in existing]).delete()
+            CoverImageVariant.objects.bulk_create(variants)
+    except Exception:
+        # 写库失败（如原图已被删除）时清理刚写入的文件
+        for variant in variants:
+            variant.content.delete(save=False)
+        raise
+
+    for variant in existing:
+        variant.content.delete(save=False)
+    # 文章列表输出中包含封面图版本
+    bump('articles')
+    return len(variants)
+
+
+def _generate_in_worker(image_id):
+    close_old_connections()
+    try:
+        generate_variants(image_id)
+    except Exception:
+        logger.exception('Failed to generate variants for cover image %s', image_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(image_id):
+    """
+    事务提交后生成封面图的版本
+    """
+    if get_settings()['ASYNC']:
+        transaction.on_commit(lambda: get_executor().submit(_generate_in_worker, image_id))
+    else:
+        transaction.on_commit(lambda: generate_variants(image_id))
+
+
+def variant_urls(variants, request=None):
+    """
+    {版本名: {'width', 'height', 格式: 地址}}，有 request 时返回绝对地址
+    """
+    result = {}
+    for variant in sorted(variants, key=lambda variant: variant.width):
+        url = variant.content.url
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        entry = result.setdefault(variant.name, {'width': variant.width, 'height': variant.height})
+        entry[variant.format] = url
+    return result
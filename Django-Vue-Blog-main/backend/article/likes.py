@@ -0,0 +1,61 @@
+"""
+文章点赞
+
+(article, user) 上有唯一约束，点赞与取消都是幂等的：
+* 点赞直接 INSERT，违反唯一约束说明已经点过赞，不会因并发重复点击产生多行
+* 取消时先锁定该行再删除，并发取消只有一次真正删除，计数只减一次
+
+计数由 signals 在创建、删除时通过 article.counters 更新。
+"""
+from django.db import IntegrityError, transaction
+
+from article.models import Article, ArticleLike
+
+MAX_BATCH_SIZE = 100
+
+
+def like(article, user):
+    """
+    点赞，返回是否新增
+    """
+    try:
+        with transaction.atomic():
+            ArticleLike.objects.create(article=article, user=user)
+    except IntegrityError:
+        return False
+    return True
+
+
+def unlike(article, user):
+    """
+    取消点赞，返回是否删除
+    """
+    with transaction.atomic():
+        existing = ArticleLike.objects.select_for_update().filter(article=article, user=user).first()
+        if existing is None:
+            return False
+        existing.delete()
+    return True
+
+
+def like_states(article_ids, user):
+    """
+    批量读取点赞数和当前用户的点赞状态，固定两次查询
+
+    返回 [{'article_id', 'like_count', 'is_liked'}, ...]，按 article_ids 的顺序，忽略不存在的文章
+    """
+    counts = dict(Article.objects.filter(pk__in=article_ids).values_list('pk', 'likes_count'))
+    liked = set()
+    if user.is_authenticated and counts:
+        liked = set(
+            ArticleLike.objects.filter(article_id__in=counts, user=user).values_list('article_id', flat=True)
+        )
+    return [
+        {
+            'article_id': article_id,
+            'like_count': counts[article_id],
+            'is_liked': article_id in liked,
+        }
+        for article_id in dict.fromkeys(article_ids)
+        if article_id in counts
+    ]
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from article.images import generate_variants
+from article.models import CoverImage
+
+
+class Command(BaseCommand):
+    """
+    生成封面图的缩放版本
+    """
+    help = '为封面图生成缩放、压缩后的版本，默认跳过已是最新的封面图'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'image_ids',
+            nargs='*',
+            type=int,
+            help='只处理指定的封面图，默认全部',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='重新生成已是最新的版本',
+        )
+
+    def handle(self, *args, **options):
+        images = CoverImage.objects.order_by('pk')
+        if options['image_ids']:
+            images = images.filter(pk__in=options['image_ids'])
+
+        generated = 0
+        for image_id in images.values_list('pk', flat=True).iterator():
+            if generate_variants(image_id, force=options['force']):
+                generated += 1
+        self.stdout.write(self.style.SUCCESS(f'已为 {generated} 张封面图生成版本'))
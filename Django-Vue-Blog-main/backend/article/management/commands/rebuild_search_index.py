@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from article.models import Article, ArticleSearchToken
+from article.search import build_weights
+
+
+class Command(BaseCommand):
+    """
+    清空并重建文章全文检索索引
+    """
+    help = '重建文章全文检索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='每次批量写入的索引条数',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        indexed = 0
+
+        with transaction.atomic():
+            ArticleSearchToken.objects.all().delete()
+
+            tokens = []
+            articles = Article.objects.only('id', 'title', 'summary', 'body').iterator()
+            for article in articles:
+                tokens.extend(
+                    ArticleSearchToken(article_id=article.id, token=token, weight=weight)
+                    for token, weight in build_weights(article).items()
+                )
+                if len(tokens) >= batch_size:
+                    ArticleSearchToken.objects.bulk_create(tokens, batch_size=batch_size)
+                    tokens = []
+                indexed += 1
+            if tokens:
+                ArticleSearchToken.objects.bulk_create(tokens, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'已索引 {indexed} 篇文章'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from article.cache import bump
+from article.counters import fold_shards, reconcile
+from article.models import Article
+
+
+class Command(BaseCommand):
+    """
+    校正文章的点赞数、阅读数、评论数
+    """
+    help = '从点赞、阅读、评论表重新计算文章计数，或只合并计数分片'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'article_ids',
+            nargs='*',
+            type=int,
+            help='只校正指定的文章，默认全部',
+        )
+        parser.add_argument(
+            '--fold',
+            action='store_true',
+            help='只把分片中的增量合并到文章，不重新计算',
+        )
+
+    def handle(self, *args, **options):
+        if options['fold']:
+            article_ids = fold_shards()
+            bump('articles', *[f'article:{pk}' for pk in article_ids])
+            self.stdout.write(self.style.SUCCESS(f'已合并 {len(article_ids)} 篇文章的计数分片'))
+            return
+
+        article_ids = options['article_ids'] or None
+        updated = reconcile(article_ids)
+        if article_ids is None:
+            article_ids = Article.objects.values_list('pk', flat=True)
+        bump('articles', *[f'article:{pk}' for pk in article_ids])
+        self.stdout.write(self.style.SUCCESS(f'已校正 {updated} 篇文章的计数'))
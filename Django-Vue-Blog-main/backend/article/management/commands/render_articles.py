@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from article.cache import bump
+from article.models import Article
+from article.rendering import render_many
+from article.toc import extract_toc
+
+
+class Command(BaseCommand):
+    """
+    为已有文章回填预渲染的 body_html / toc_html 和结构化目录 toc
+
+    修改 Markdown 扩展后可使用 --force 通过进程池批量重新渲染
+    """
+    help = '渲染文章 Markdown 并保存 body_html / toc_html'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='忽略内容哈希，强制重新渲染所有文章',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='渲染进程数，默认使用 CPU 核数',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='每批提交给进程池的文章数',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        batch_size = options['batch_size']
+        timeout = getattr(settings, 'MARKDOWN_RENDER_TIMEOUT', None)
+        rendered = 0
+        timed_out = []
+
+        batch = []
+        articles = Article.objects.only('id', 'body', 'body_hash').iterator()
+        for article in articles:
+            body_hash = Article.hash_body(article.body)
+            if not force and body_hash == article.body_hash:
+                continue
+            batch.append((article.pk, body_hash, article.body))
+            if len(batch) >= batch_size:
+                rendered += self.render_batch(batch, timeout, options['workers'], timed_out)
+                batch = []
+        if batch:
+            rendered += self.render_batch(batch, timeout, options['workers'], timed_out)
+
+        self.stdout.write(self.style.SUCCESS(f'已渲染 {rendered} 篇文章'))
+        if rendered:
+            bump('articles')
+        if timed_out:
+            self.stdout.write(self.style.WARNING(f'渲染超时或失败的文章: {timed_out}'))
+
+    def render_batch(self, batch, timeout, workers, timed_out):
+        hashes = {pk: body_hash for pk, body_hash, _ in batch}
+        bodies = {pk: body for pk, _, body in batch}
+        rendered = 0
+
+        results = render_many(bodies.items(), timeout=timeout, max_workers=workers)
+        for pk, html, toc_html in results:
+            if html is None:
+                timed_out.append(pk)
+                continue
+            # 使用 update 避免修改 updated_at，不会触发信号，需要手动使缓存失效
+            Article.objects.filter(pk=pk).update(
+                body_html=html,
+                toc_html=toc_html,
+                body_hash=hashes[pk],
+                toc=extract_toc(bodies[pk]),
+            )
+            bump(f'article:{pk}')
+            rendered += 1
+
+        return rendered
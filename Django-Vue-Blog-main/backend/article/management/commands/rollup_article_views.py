@@ -0,0 +1,67 @@
+import csv
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from article.rollups import hour_bucket, prune_hourly, rollup_views
+
+
+class Command(BaseCommand):
+    """
+    把原始阅读记录汇总到小时表和天表，并删除已汇总的记录
+    """
+    help = '汇总并压缩文章阅读记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-hours',
+            type=int,
+            default=0,
+            help='保留最近几个完整小时的原始记录，默认只保留当前小时',
+        )
+        parser.add_argument(
+            '--hourly-retention-days',
+            type=int,
+            default=30,
+            help='小时汇总保留的天数，0 表示不清理',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='每个事务处理的记录数',
+        )
+        parser.add_argument(
+            '--archive',
+            help='删除前把原始记录追加写入该 CSV 文件',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        before = hour_bucket(now) - datetime.timedelta(hours=options['keep_hours'])
+
+        archive_file = open(options['archive'], 'a', newline='') if options['archive'] else None
+        try:
+            archive = None
+            if archive_file is not None:
+                writer = csv.writer(archive_file)
+
+                def archive(rows):
+                    writer.writerows(
+                        (pk, article_id, viewed_at.isoformat()) for pk, article_id, viewed_at in rows
+                    )
+                    archive_file.flush()
+
+            rolled = rollup_views(before, chunk_size=options['chunk_size'], archive=archive)
+        finally:
+            if archive_file is not None:
+                archive_file.close()
+        self.stdout.write(self.style.SUCCESS(f'已汇总 {rolled} 条阅读记录'))
+
+        if options['hourly_retention_days']:
+            pruned = prune_hourly(
+                now - datetime.timedelta(days=options['hourly_retention_days']),
+                chunk_size=options['chunk_size'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'已清理 {pruned} 条小时汇总'))
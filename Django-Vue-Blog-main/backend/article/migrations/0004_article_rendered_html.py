@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0003_initial_categories'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='body_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='body_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='toc_html',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
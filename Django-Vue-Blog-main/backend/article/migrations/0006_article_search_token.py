@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0005_article_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='article.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'article'], name='search_token_article_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'token'), name='unique_article_token')],
+            },
+        ),
+    ]
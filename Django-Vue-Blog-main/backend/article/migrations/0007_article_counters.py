@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(article=OuterRef('pk'))
+            .order_by()
+            .values('article')
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Article = apps.get_model('article', 'Article')
+    Article.objects.update(
+        likes_count=count_subquery(apps.get_model('article', 'ArticleLike')),
+        views_count=count_subquery(apps.get_model('article', 'ArticleView')),
+        comments_count=count_subquery(apps.get_model('comment', 'Comment')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0006_article_search_token'),
+        ('comment', '0003_comment_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ArticleCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('likes_count', models.IntegerField(default=0)),
+                ('views_count', models.IntegerField(default=0)),
+                ('comments_count', models.IntegerField(default=0)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='article.article')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('article', 'shard'), name='unique_article_counter_shard')],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
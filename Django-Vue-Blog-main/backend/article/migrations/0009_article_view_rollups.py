@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0008_article_view_viewed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_days', to='article.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='article_view_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'day'), name='unique_article_view_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleViewHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_hours', to='article.article')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='article_view_hour_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('article', 'bucket'), name='unique_article_view_hour')],
+            },
+        ),
+    ]
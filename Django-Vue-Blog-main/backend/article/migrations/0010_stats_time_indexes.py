@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0009_article_view_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articlelike',
+            index=models.Index(fields=['article', 'liked_at'], name='article_like_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articleview',
+            index=models.Index(fields=['article', 'viewed_at'], name='article_view_time_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0010_stats_time_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleVisitorSketch',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='visitor_sketch', serialize=False, to='article.article')),
+                ('sketch', models.BinaryField(default=b'')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='articleviewdaily',
+            name='visitors',
+            field=models.BinaryField(default=b''),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_likes(apps, schema_editor):
+    """
+    并发点赞产生的重复记录只保留最早的一条，并校正点赞数
+    """
+    ArticleLike = apps.get_model('article', 'ArticleLike')
+    Article = apps.get_model('article', 'Article')
+    duplicates = (
+        ArticleLike.objects.values('article', 'user')
+        .annotate(first=Min('pk'), total=Count('pk'))
+        .filter(total__gt=1)
+    )
+    articles = set()
+    for row in duplicates:
+        ArticleLike.objects.filter(article=row['article'], user=row['user']).exclude(pk=row['first']).delete()
+        articles.add(row['article'])
+    for article_id in articles:
+        Article.objects.filter(pk=article_id).update(
+            likes_count=ArticleLike.objects.filter(article_id=article_id).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0011_article_visitor_sketches'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='articlelike',
+            constraint=models.UniqueConstraint(fields=('article', 'user'), name='unique_article_like'),
+        ),
+    ]
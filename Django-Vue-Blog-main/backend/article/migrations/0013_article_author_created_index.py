@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0012_unique_article_like'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='article_author_created_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0013_article_author_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20)),
+                ('format', models.CharField(max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('content', models.ImageField(upload_to='coverimage/variants/%Y%m%d')),
+                ('source', models.CharField(max_length=255)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='article.coverimage')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('image', 'name', 'format'), name='unique_cover_variant')],
+            },
+        ),
+    ]
@@ -0,0 +1,108 @@
+"""
+稀疏字段集
+
+?fields=id,title 只返回指定字段，?exclude=body 去掉指定字段，
+同时根据剩余字段用 only() 裁剪查询，不需要的列不会从数据库读取。
+"""
+from django.db import models
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+
+def parse_field_names(value):
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    根据请求参数裁剪序列化器字段
+
+    只裁剪以 sparse_fields=True 创建的顶层序列化器（视图的 get_serializer 会传入）；
+    共用同一 context 的嵌套序列化器，如文章详情中内嵌的评论，保持完整。
+    """
+
+    def __init__(self, *args, sparse_fields=False, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        request = self.context.get('request')
+        if not sparse_fields or request is None:
+            return
+
+        fields = parse_field_names(request.query_params.get(FIELDS_PARAM))
+        exclude = parse_field_names(request.query_params.get(EXCLUDE_PARAM))
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or (exclude and name in exclude):
+                self.fields.pop(name)
+
+
+def sparse_columns(serializer, model):
+    """
+    计算序列化器剩余字段需要读取的模型列
+
+    无法确定依赖的字段（SerializerMethodField、模型属性等）返回 None，表示不裁剪。
+    主键和外键列始终读取（select_related / prefetch_related 需要），
+    但只有在剩余字段中的 category_id、coverimage_id 等才会输出。
+    """
+    opts = model._meta
+    concrete = {}
+    for field in opts.concrete_fields:
+        concrete[field.name] = field.name
+        concrete[field.attname] = field.name
+    relations = {
+        field.name for field in opts.get_fields()
+        if field.is_relation and not field.concrete
+    }
+    relations.update(
+        field.get_accessor_name() for field in opts.related_objects
+    )
+
+    columns = {opts.pk.name}
+    columns.update(
+        field.name for field in opts.concrete_fields
+        if isinstance(field, models.ForeignKey)
+    )
+
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.HyperlinkedIdentityField):
+            continue
+        source = field.source.split('.')[0]
+        if source in concrete:
+            columns.add(concrete[source])
+        elif source in relations:
+            continue
+        else:
+            return None
+
+    return columns
+
+
+class SparseFieldsetViewMixin:
+    """
+    只读请求按序列化器剩余字段裁剪查询集
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), SparseFieldsetSerializerMixin):
+            kwargs.setdefault('sparse_fields', True)
+        return super().get_serializer(*args, **kwargs)
+
+    def sparse_queryset(self, queryset, serializer):
+        columns = sparse_columns(serializer, queryset.model)
+        if columns is None:
+            return queryset
+        # 分页排序字段在翻页时还要读取
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        columns.update(field.lstrip('-') for field in ordering)
+        return queryset.only(*columns)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return self.sparse_queryset(queryset, self.get_serializer())
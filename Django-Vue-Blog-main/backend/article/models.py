@@ -1,9 +1,17 @@
+import hashlib
+import logging
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
-from markdown import Markdown
+from django.utils.html import escape
 from django.conf import settings
 
+from article.rendering import render_markdown, RenderError
+from article.toc import extract_toc
+
+logger = logging.getLogger(__name__)
+
 
 class CoverImage(models.Model):
     """
@@ -15,6 +23,28 @@ class CoverImage(models.Model):
         return f"CoverImage {self.id}"
 
 
+class CoverImageVariant(models.Model):
+    """
+    封面图的缩放、重新压缩版本，由 article.images 在上传后异步生成
+    """
+    image = models.ForeignKey(CoverImage, on_delete=models.CASCADE, related_name='variants')
+    name = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    content = models.ImageField(upload_to='coverimage/variants/%Y%m%d')
+    # 生成时原图的文件名，原图替换后据此判断需要重新生成
+    source = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['image', 'name', 'format'], name='unique_cover_variant'),
+        ]
+
+    def __str__(self):
+        return f"CoverImage {self.image_id} {self.name}.{self.format}"
+
+
 class Category(models.Model):
     """
     文章分类
@@ -63,37 +93,107 @@ class Article(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     published = models.BooleanField(default=False)
     toc = models.JSONField(default=list, blank=True)
+    # 预渲染的 Markdown 结果，body 变化时才重新渲染
+    body_html = models.TextField(blank=True, default='')
+    toc_html = models.TextField(blank=True, default='')
+    body_hash = models.CharField(max_length=64, blank=True, default='')
+    # 冗余计数，见 article.counters
+    likes_count = models.PositiveIntegerField(default=0)
+    views_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ('likes_count', 'views_count', 'comments_count')
+    # 建立检索索引的字段，与 article.search.FIELD_WEIGHTS 一致
+    SEARCH_FIELDS = ('title', 'summary', 'body')
+
+    class Meta:
+        indexes = [
+            # 文章列表的游标分页
+            models.Index(fields=['created_at', 'id'], name='article_created_id_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='article_cat_created_id_idx'),
+            # 用户主页的最新文章
+            models.Index(fields=['author', 'created_at', 'id'], name='article_author_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_search_fields()
+        return instance
+
+    def remember_search_fields(self):
+        """
+        记录已加载的检索字段，保存时据此判断是否需要重建索引
+        """
+        self._saved_search_fields = {
+            field: self.__dict__[field] for field in self.SEARCH_FIELDS if field in self.__dict__
+        }
+
+    def search_fields_changed(self, update_fields=None):
+        """
+        检索字段（限于 update_fields）是否与上次加载或保存时不同；
+        新建的对象和未加载的字段视为已变化
+        """
+        saved = getattr(self, '_saved_search_fields', {})
+        fields = self.SEARCH_FIELDS if update_fields is None else set(self.SEARCH_FIELDS) & set(update_fields)
+        return any(field not in saved or saved[field] != getattr(self, field) for field in fields)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'body' in update_fields:
+            if self.render_body() and update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'body_html', 'toc_html', 'body_hash', 'toc'
+                }
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # 计数只通过 F() 更新，编辑文章时不写回内存中可能过期的值
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        self.remember_search_fields()
+
+    @staticmethod
+    def hash_body(body):
+        return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+    def render_body(self, force=False):
+        """
+        body 的哈希变化时重新渲染 body_html / toc_html 并提取结构化目录 toc，
+        返回是否重新渲染
+        """
+        body_hash = self.hash_body(self.body)
+        if not force and body_hash == self.body_hash:
+            return False
+        self.toc = extract_toc(self.body)
+        try:
+            self.body_html, self.toc_html = self.get_md(
+                timeout=getattr(settings, 'MARKDOWN_RENDER_TIMEOUT', None)
+            )
+        except RenderError:
+            # 渲染超时或失败则以纯文本展示，body_hash 留空以便之后重新渲染
+            logger.warning('Markdown render failed for article %s', self.pk, exc_info=True)
+            self.body_html = f'<pre>{escape(self.body)}</pre>'
+            self.toc_html = ''
+            self.body_hash = ''
+            return True
+        self.body_hash = body_hash
+        return True
     
     @property
     def category_id(self):
         return self.category.id if self.category else None
     
-    def get_md(self):
-        md = Markdown(
-            extensions=[
-                'markdown.extensions.extra',
-                'markdown.extensions.codehilite',
-                'markdown.extensions.toc',
-            ]
+    def get_md(self, timeout=None):
+        return render_markdown(
+            self.body,
+            timeout=timeout,
+            max_workers=getattr(settings, 'MARKDOWN_RENDER_WORKERS', None),
         )
-        md_body = md.convert(self.body)
-
-        return md_body, md.toc
-
-    @property
-    def likes_count(self):
-        return self.articlelike_set.count()
-
-    @property
-    def views_count(self):
-        return self.articleview_set.count()
-    
-    @property
-    def comments_count(self):
-        return self.comments.count()
 
 
 class Comment(models.Model):
@@ -109,10 +209,106 @@ class Comment(models.Model):
 
 class ArticleView(models.Model):
     article = models.ForeignKey(Article, on_delete=models.CASCADE)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # 阅读记录经缓冲后批量写入，保留实际的阅读时间
+    viewed_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            # 按文章和时间范围统计
+            models.Index(fields=['article', 'viewed_at'], name='article_view_time_idx'),
+        ]
+
+
+class ArticleViewHourly(models.Model):
+    """
+    按小时汇总的阅读量，见 article.rollups
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='view_hours')
+    # 小时的起始时间
+    bucket = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'bucket'], name='unique_article_view_hour'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='article_view_hour_bucket_idx'),
+        ]
+
+
+class ArticleViewDaily(models.Model):
+    """
+    按天（settings.TIME_ZONE）汇总的阅读量，见 article.rollups
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='view_days')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    # 当天访客的 HyperLogLog 草图，见 article.visitors
+    visitors = models.BinaryField(default=b'')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'day'], name='unique_article_view_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='article_view_day_idx'),
+        ]
+
+
+class ArticleVisitorSketch(models.Model):
+    """
+    文章全部访客的 HyperLogLog 草图，见 article.visitors
+    """
+    article = models.OneToOneField(
+        Article, on_delete=models.CASCADE, primary_key=True, related_name='visitor_sketch'
+    )
+    sketch = models.BinaryField(default=b'')
 
 
 class ArticleLike(models.Model):
     article = models.ForeignKey(Article, on_delete=models.CASCADE)
     user = models.ForeignKey('user_info.User', on_delete=models.CASCADE)
     liked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'user'], name='unique_article_like'),
+        ]
+        indexes = [
+            models.Index(fields=['article', 'liked_at'], name='article_like_time_idx'),
+        ]
+
+
+class ArticleCounterShard(models.Model):
+    """
+    文章计数的分片，启用 ARTICLE_COUNTER_SHARDS 时增量先写入随机分片，
+    再由 reconcile_article_counters --fold 合并到 Article，避免热点行锁竞争
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    likes_count = models.IntegerField(default=0)
+    views_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'shard'], name='unique_article_counter_shard'),
+        ]
+
+
+class ArticleSearchToken(models.Model):
+    """
+    文章全文检索的倒排索引，见 article.search
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'token'], name='unique_article_token'),
+        ]
+        indexes = [
+            models.Index(fields=['token', 'article'], name='search_token_article_idx'),
+        ]
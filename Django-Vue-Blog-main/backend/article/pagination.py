@@ -0,0 +1,226 @@
+"""
+键集（游标）分页
+
+DRF 自带的 CursorPagination 只用排序的第一个字段定位，相同值之间依靠偏移量。
+这里的游标记录排序中所有字段的值，查询条件为
+(a < x) OR (a = x AND b < y) ...，配合组合索引，无论翻到多深都只扫描一页的数据。
+"""
+import datetime
+import json
+from base64 import b64decode, b64encode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    按 ordering 中所有字段做键集分页，最后一个字段必须唯一（通常是 id）
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        reverse, values = cursor if cursor else (False, None)
+
+        ordering = self.get_ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            try:
+                values = self.clean_values(queryset, ordering, values)
+                queryset = queryset.filter(self.keyset_filter(ordering, values))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except (KeyError, ValueError):
+                return self.page_size
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        return self.page_size
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return tuple(self.ordering)
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    def clean_values(self, queryset, ordering, values):
+        """
+        按排序字段（模型字段或注解）的类型转换游标中的值，类型不符时抛出 ValidationError
+        """
+        cleaned = []
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            try:
+                model_field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                model_field = queryset.query.annotations[name].output_field
+            if value is None:
+                raise ValidationError('Cursor value cannot be null')
+            cleaned.append(model_field.to_python(value))
+        return cleaned
+
+    def keyset_filter(self, ordering, values):
+        """
+        生成严格位于游标之后的查询条件
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    @staticmethod
+    def encode_value(value):
+        # 保留完整的微秒精度，DjangoJSONEncoder 会截断到毫秒导致游标定位错误
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return str(value)
+
+    @classmethod
+    def encode_position(cls, reverse, values):
+        data = json.dumps([int(reverse), values], default=cls.encode_value)
+        return b64encode(data.encode('utf-8')).decode('ascii')
+
+    def cursor_after(self, instance):
+        """
+        从 instance 之后开始的游标值，用于在其他响应中给出“下一页”
+        """
+        return self.encode_position(False, self.get_position(instance))
+
+    def encode_cursor(self, reverse, values):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_position(reverse, values)
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            reverse, values = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), values
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.get_position(self.page[0]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': '分页游标',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': '每页数量',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class ArticlePagination(KeysetPagination):
+    """
+    文章列表按 (created_at, id) 倒序分页
+    """
+    ordering = ('-created_at', '-id')
+
+
+class CommentPagination(KeysetPagination):
+    """
+    顶层评论按 (created_at, id) 倒序分页，与 Comment.Meta.ordering 一致，新评论不影响后续页
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+
+
+class ReplyPagination(KeysetPagination):
+    """
+    一条评论的回复按路径（树的先序）分页，路径在同一篇文章内唯一
+    """
+    ordering = ('path',)
+    page_size = 20
+
+
+class ArticleStatsPagination(KeysetPagination):
+    """
+    文章统计按请求指定的排序分页
+    """
+
+    def __init__(self, ordering):
+        self.ordering = ordering
@@ -0,0 +1,142 @@
+"""
+编辑器实时预览
+
+正文按标题切分为若干段，每段以内容哈希为键缓存渲染结果（按编辑会话隔离），
+每次预览只渲染并返回会话中尚未出现过的段落，目录只由标题行重新生成。
+
+* 段落单独渲染时标题 id 从头编号，渲染后替换为整篇文档中的锚点（与 extract_toc 一致），
+  锚点计入段落哈希，前文新增同名标题时后面的段落会重新下发
+* 新段落与目录在进程池中一次渲染，每个段落单独受 MARKDOWN_RENDER_TIMEOUT 限制，
+  渲染成功的段落立即缓存，超时的段落以纯文本返回且不缓存，下次预览时重新渲染
+"""
+import hashlib
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.html import escape
+
+from article.rendering import RenderError, render_sections
+from article.toc import FENCE_RE, HEADING_RE, close_fence, extract_toc, heading_lines
+
+PREVIEW_SESSION_TIMEOUT = 60 * 30
+
+SESSION_RE = re.compile(r'^[0-9a-f]{32}$')
+HEADING_ID_RE = re.compile(r'(<h[1-6]\b[^>]*?\bid=")([^"]*)(")')
+
+
+def split_sections(body):
+    """
+    按 ATX 标题切分正文，代码块中的 # 不会被当作标题
+    """
+    sections = []
+    current = []
+    fence = None
+
+    for line in body.splitlines(keepends=True):
+        match = FENCE_RE.match(line)
+        if fence is None:
+            if match:
+                fence = match.group(1)
+            elif HEADING_RE.match(line) and current:
+                sections.append(''.join(current))
+                current = []
+        elif close_fence(fence, match):
+            fence = None
+        current.append(line)
+
+    if current:
+        sections.append(''.join(current))
+    return sections
+
+
+def section_hash(text, anchors):
+    data = '\0'.join([text, *anchors])
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def _cache_key(session, digest):
+    return f'article:preview:{session}:{digest}'
+
+
+def section_anchors(sections, toc):
+    """
+    返回每个段落的 (单独渲染时的标题 id, 在整篇文档中的锚点)
+    """
+    result = []
+    position = 0
+    for text in sections:
+        local = [heading['anchor'] for heading in extract_toc(text)]
+        result.append((local, [heading['anchor'] for heading in toc[position:position + len(local)]]))
+        position += len(local)
+    return result
+
+
+def assign_anchors(html, local, anchors):
+    """
+    把段落单独渲染得到的标题 id 依次替换为整篇文档中的锚点
+    """
+    pending = list(zip(local, anchors))
+
+    def replace(match):
+        if pending and match.group(2) == pending[0][0]:
+            _, anchor = pending.pop(0)
+            return f'{match.group(1)}{anchor}{match.group(3)}'
+        return match.group(0)
+
+    return HEADING_ID_RE.sub(replace, html)
+
+
+def build_preview(body, session=None):
+    """
+    返回预览数据
+
+    sections 为所有段落哈希（按顺序），changed 为本会话中新出现段落的 {哈希: html}，
+    客户端用已有的 html 与 changed 按 sections 顺序拼接出完整预览。
+    ATX 标题以外的 Setext 标题不参与切分。
+    """
+    if not isinstance(session, str) or not SESSION_RE.match(session):
+        session = uuid.uuid4().hex
+    sections = split_sections(body)
+    toc = extract_toc(body)
+    anchors = section_anchors(sections, toc)
+    digests = [section_hash(text, global_anchors) for text, (_, global_anchors) in zip(sections, anchors)]
+
+    cached = cache.get_many([_cache_key(session, digest) for digest in digests])
+    pending = {}
+    for digest, text, section_ids in zip(digests, sections, anchors):
+        if _cache_key(session, digest) not in cached and digest not in pending:
+            pending[digest] = (text, section_ids)
+
+    texts = [text for text, _ in pending.values()]
+    headings = '\n\n'.join(heading_lines(body))
+    try:
+        rendered = render_sections(
+            texts + [headings],
+            timeout=getattr(settings, 'MARKDOWN_RENDER_TIMEOUT', None),
+            max_workers=getattr(settings, 'MARKDOWN_RENDER_WORKERS', None),
+        )
+    except RenderError:
+        rendered = [None] * (len(texts) + 1)
+
+    changed = {}
+    for (digest, (text, section_ids)), result in zip(pending.items(), rendered):
+        if result is None:
+            changed[digest] = f'<pre>{escape(text)}</pre>'
+            continue
+        changed[digest] = assign_anchors(result[0], *section_ids)
+        # 新段落写入缓存
+        cached[_cache_key(session, digest)] = changed[digest]
+    toc_html = rendered[-1][1] if rendered[-1] else ''
+
+    # 仍在使用的段落续期
+    cache.set_many(cached, timeout=PREVIEW_SESSION_TIMEOUT)
+
+    return {
+        'session': session,
+        'sections': digests,
+        'changed': changed,
+        'toc': toc,
+        'toc_html': toc_html,
+    }
@@ -0,0 +1,245 @@
+"""
+Markdown 渲染引擎
+
+* 每个线程复用一个 Markdown 实例，每次使用前 reset()，避免重复加载扩展
+* 批量渲染通过进程池并行执行
+* 每篇文档有时间预算，在子进程内计算，超时抛出 RenderTimeout，避免异常内容长期占用工作线程
+* 子进程异常退出（看门狗结束卡死的渲染、OOM 等）时换用新的进程池，只重试未完成的文档
+* 代码块高亮结果按内容哈希缓存，见 highlight 模块
+
+本模块不依赖 Django，可以在进程池的子进程中直接导入。
+"""
+import faulthandler
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from markdown import Markdown
+
+from article import highlight
+
+EXTENSIONS = [
+    'markdown.extensions.extra',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.toc',
+]
+
+# SIGALRM 无法打断卡在 C 代码中的渲染，子进程超出预算这么久后由看门狗直接退出
+WATCHDOG_GRACE = 2.0
+# 时间预算只在子进程内计算，调用方另外最多等待这么久，用于在进程池中排队
+QUEUE_TIMEOUT = 30.0
+
+_local = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class RenderError(Exception):
+    """
+    渲染失败：超出时间预算，或渲染进程异常退出
+    """
+
+
+class RenderTimeout(RenderError):
+    """
+    单篇文档渲染超出时间预算
+    """
+
+
+def get_renderer():
+    """
+    获取当前线程复用的 Markdown 实例
+    """
+    md = getattr(_local, 'md', None)
+    if md is None:
+        highlight.install()
+        md = Markdown(extensions=EXTENSIONS)
+        _local.md = md
+    return md
+
+
+def render(text):
+    """
+    在当前线程渲染 Markdown，返回 (html, toc)
+    """
+    md = get_renderer()
+    md.reset()
+    try:
+        return md.convert(text), md.toc
+    finally:
+        md.reset()
+
+
+def _raise_timeout(signum, frame):
+    raise RenderTimeout()
+
+
+def _call_with_alarm(timeout, func, *args):
+    """
+    在进程池子进程中执行，用 SIGALRM 限制渲染时间，
+    SIGALRM 未能生效时由 faulthandler 的看门狗线程结束子进程
+    """
+    if not timeout or not hasattr(signal, 'setitimer'):
+        return func(*args)
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    faulthandler.dump_traceback_later(timeout + WATCHDOG_GRACE, exit=True)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        faulthandler.cancel_dump_traceback_later()
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _render_with_alarm(text, timeout):
+    return _call_with_alarm(timeout, render, text)
+
+
+def _render_each_with_alarm(texts, timeout):
+    """
+    依次渲染各片段，每个片段单独计时；超时或出错的片段结果为 None，不影响其他片段
+    """
+    results = []
+    for text in texts:
+        try:
+            results.append(_call_with_alarm(timeout, render, text))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def get_executor(max_workers=None):
+    """
+    懒加载的渲染进程池，使用 spawn 避免在多线程进程中 fork
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=get_context('spawn'),
+            )
+        return _executor
+
+
+def _recycle_executor(executor):
+    """
+    之后的渲染改用新的进程池，旧进程池不再接受任务
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _run_in_pool(func, args, timeout, max_workers):
+    """
+    在共享进程池中执行 func(*args)
+
+    时间预算由子进程自己执行（SIGALRM 与看门狗），调用方最多等待
+    timeout + WATCHDOG_GRACE + QUEUE_TIMEOUT 秒，排队等待其他渲染不占用文档的预算；
+    等待超时时取消尚未开始的任务并抛出 RenderTimeout。
+    子进程异常退出（如被看门狗或 OOM 杀死）时换新的进程池重试一次，仍然失败抛出 RenderError。
+    """
+    for _ in range(2):
+        executor = get_executor(max_workers)
+        try:
+            future = executor.submit(func, *args)
+        except RuntimeError:
+            # 进程池已损坏，或刚被其他线程回收，换新的进程池
+            _recycle_executor(executor)
+            continue
+        try:
+            return future.result(timeout=timeout + WATCHDOG_GRACE + QUEUE_TIMEOUT)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RenderTimeout()
+        except BrokenProcessPool:
+            _recycle_executor(executor)
+    raise RenderError('Markdown render process exited unexpectedly')
+
+
+def render_markdown(text, timeout=None, max_workers=None):
+    """
+    渲染单篇文档，返回 (html, toc)
+
+    未设置 timeout 时直接在当前线程渲染；
+    否则交给进程池（max_workers 个进程），超时抛出 RenderTimeout，不会阻塞调用线程。
+    """
+    if not timeout:
+        return render(text)
+    return _run_in_pool(_render_with_alarm, (text, timeout), timeout, max_workers)
+
+
+def render_sections(texts, timeout=None, max_workers=None):
+    """
+    渲染一组文档片段，返回 [(html, toc) 或 None, ...]
+
+    全部片段在一次进程池调用中依次渲染，每个片段有各自的时间预算，超时或出错的片段为 None；
+    调用方的等待时间按片段数累计。进程池异常时抛出 RenderError，规则同 render_markdown。
+    未设置 timeout 时直接在当前线程渲染。
+    """
+    texts = list(texts)
+    if not timeout:
+        return [render(text) for text in texts]
+    if not texts:
+        return []
+    return _run_in_pool(
+        _render_each_with_alarm, (texts, timeout), timeout * len(texts), max_workers
+    )
+
+
+def _render_in_new_pool(items, timeout, max_workers, unfinished):
+    """
+    在新的进程池中渲染 items，产出完成的 (key, html, toc)，失败的文档产出 (key, None, None)；
+    进程池损坏时池中所有未完成的任务都会失败，这些文档追加到 unfinished 而不是判为失败
+    """
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=get_context('spawn'),
+    ) as executor:
+        futures = [
+            (key, text, executor.submit(_render_with_alarm, text, timeout))
+            for key, text in items
+        ]
+        for key, text, future in futures:
+            try:
+                html, toc = future.result()
+            except BrokenProcessPool:
+                unfinished.append((key, text))
+            except Exception:
+                # 超时或 Markdown 扩展抛出的异常只影响这一篇文档
+                yield key, None, None
+            else:
+                yield key, html, toc
+
+
+def render_many(items, timeout=None, max_workers=None):
+    """
+    批量并行渲染
+
+    items 为 (key, text) 的可迭代对象，逐个产出 (key, html, toc)（不保证顺序）；
+    超时、渲染出错或导致子进程异常退出的文档产出 (key, None, None)。
+
+    进程池损坏时换新的进程池，只重新提交未完成的文档。再次损坏时剩余文档改用单进程的进程池
+    依次渲染，此时第一篇未完成的文档就是导致损坏的文档，只有它判为失败。
+    """
+    pending = list(items)
+    for _ in range(2):
+        if not pending:
+            return
+        unfinished = []
+        yield from _render_in_new_pool(pending, timeout, max_workers, unfinished)
+        pending = unfinished
+
+    while pending:
+        unfinished = []
+        yield from _render_in_new_pool(pending, timeout, 1, unfinished)
+        if unfinished:
+            yield unfinished[0][0], None, None
+        pending = unfinished[1:]
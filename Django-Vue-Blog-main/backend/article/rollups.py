@@ -0,0 +1,167 @@
+"""
+阅读量的时间分桶汇总
+
+ArticleView 每次阅读一行，会无限增长。rollup_views() 按主键顺序分块读取原始记录，
+累加到 ArticleViewHourly / ArticleViewDaily，并在同一事务中删除已汇总的记录。
+查询时间序列只读汇总表，再加上尚未汇总的少量原始记录，结果仍然精确。
+
+* 天按 settings.TIME_ZONE 划分
+* 小时表可以只保留最近一段时间（prune_hourly），更早的按天查询
+"""
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from article.models import ArticleView, ArticleViewDaily, ArticleViewHourly
+
+INTERVALS = ('hour', 'day')
+# 单次查询最多返回的桶数
+MAX_SERIES_POINTS = 5000
+
+
+def hour_bucket(value):
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(value):
+    return timezone.localtime(value).date()
+
+
+def day_start(day):
+    """
+    某天 0 点（当前时区）
+    """
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def add_to_buckets(model, field, totals):
+    """
+    把 {(article_id, 桶): 阅读量} 累加到汇总表，需在事务中调用
+    """
+    if not totals:
+        return
+    existing = {
+        (row.article_id, getattr(row, field)): row
+        for row in model.objects.select_for_update().filter(
+            article_id__in={article_id for article_id, _ in totals},
+            **{f'{field}__in': {bucket for _, bucket in totals}}
+        )
+    }
+    updated = []
+    created = []
+    for (article_id, bucket), views in totals.items():
+        row = existing.get((article_id, bucket))
+        if row is None:
+            created.append(model(article_id=article_id, views=views, **{field: bucket}))
+        else:
+            row.views += views
+            updated.append(row)
+    model.objects.bulk_update(updated, ['views'], batch_size=500)
+    model.objects.bulk_create(created, batch_size=500)
+
+
+def rollup_views(before, chunk_size=5000, archive=None):
+    """
+    汇总 viewed_at 早于 before 的原始记录并删除，返回处理的条数
+
+    archive 为可选的回调，删除前以 [(id, article_id, viewed_at), ...] 调用
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                ArticleView.objects
+                .filter(viewed_at__lt=before)
+                .order_by('pk')
+                .values_list('pk', 'article_id', 'viewed_at')[:chunk_size]
+            )
+            if not rows:
+                return total
+            hours = Counter()
+            days = Counter()
+            for _, article_id, viewed_at in rows:
+                hours[(article_id, hour_bucket(viewed_at))] += 1
+                days[(article_id, day_bucket(viewed_at))] += 1
+            add_to_buckets(ArticleViewHourly, 'bucket', hours)
+            add_to_buckets(ArticleViewDaily, 'day', days)
+            if archive is not None:
+                archive(rows)
+            ArticleView.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        total += len(rows)
+
+
+def prune_hourly(before, chunk_size=5000):
+    """
+    分块删除早于 before 的小时汇总，返回删除的条数
+    """
+    total = 0
+    while True:
+        pks = list(
+            ArticleViewHourly.objects
+            .filter(bucket__lt=before)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not pks:
+            return total
+        ArticleViewHourly.objects.filter(pk__in=pks).delete()
+        total += len(pks)
+
+
+def series_length(start, end, interval):
+    days = (end - start).days + 1
+    return days * 24 if interval == 'hour' else days
+
+
+def view_series(article_id, start, end, interval='day'):
+    """
+    文章在 [start, end] 日期范围内的阅读量序列，缺少的桶补 0
+
+    返回 [(桶, 阅读量), ...]，按天时桶为 date，按小时时桶为当前时区的 datetime
+    """
+    since = day_start(start)
+    until = day_start(end + datetime.timedelta(days=1))
+    if interval == 'hour':
+        totals = Counter(dict(
+            ArticleViewHourly.objects
+            .filter(article_id=article_id, bucket__gte=since, bucket__lt=until)
+            .values_list('bucket', 'views')
+        ))
+        trunc = TruncHour('viewed_at')
+    else:
+        totals = Counter(dict(
+            ArticleViewDaily.objects
+            .filter(article_id=article_id, day__gte=start, day__lte=end)
+            .values_list('day', 'views')
+        ))
+        trunc = TruncDay('viewed_at')
+
+    # 尚未汇总的原始记录
+    raw = (
+        ArticleView.objects
+        .filter(article_id=article_id, viewed_at__gte=since, viewed_at__lt=until)
+        .annotate(bucket=trunc)
+        .order_by()
+        .values_list('bucket')
+        .annotate(views=Count('id'))
+    )
+    for bucket, views in raw:
+        key = hour_bucket(bucket) if interval == 'hour' else day_bucket(bucket)
+        totals[key] += views
+
+    series = []
+    if interval == 'hour':
+        bucket = hour_bucket(since)
+        while bucket < until:
+            series.append((bucket, totals[bucket]))
+            bucket = hour_bucket(bucket + datetime.timedelta(hours=1))
+    else:
+        day = start
+        while day <= end:
+            series.append((day, totals[day]))
+            day += datetime.timedelta(days=1)
+    return series
@@ -0,0 +1,174 @@
+"""
+文章全文检索
+
+对 title / summary / body 建立倒排索引（ArticleSearchToken 表）：
+* 中日韩文字切分为单字和相邻二字（bigram）
+* 拉丁字母与数字按单词切分并转为小写
+
+查询时同样切分，所有词都命中的文章按 Σ 权重 × idf 排序，并生成高亮摘要。
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.utils.html import escape
+
+from article.models import Article, ArticleSearchToken
+
+MAX_TOKEN_LENGTH = 64
+FIELD_WEIGHTS = {
+    'title': 10.0,
+    'summary': 3.0,
+    'body': 1.0,
+}
+SNIPPET_LENGTH = 120
+
+CJK_RE = re.compile(
+    '[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+'
+)
+WORD_RE = re.compile(r'[a-z0-9_]+')
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text):
+    """
+    切分文本，返回词列表（保留重复，用于统计词频）
+    """
+    text = normalize(text)
+    tokens = []
+    for run in CJK_RE.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(
+        word[:MAX_TOKEN_LENGTH] for word in WORD_RE.findall(CJK_RE.sub(' ', text))
+    )
+    return tokens
+
+
+def tokenize_query(query):
+    """
+    查询词：中文连续片段只取 bigram（单字片段取单字），去重
+    """
+    query = normalize(query)
+    tokens = []
+    for run in CJK_RE.findall(query):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(
+        word[:MAX_TOKEN_LENGTH] for word in WORD_RE.findall(CJK_RE.sub(' ', query))
+    )
+    return list(dict.fromkeys(tokens))
+
+
+def build_weights(article):
+    """
+    计算文章每个词的权重：各字段词频按字段权重加总后取对数
+    """
+    raw = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for token, tf in Counter(tokenize(getattr(article, field))).items():
+            raw[token] += tf * field_weight
+    return {token: 1.0 + math.log(value) for token, value in raw.items()}
+
+
+def index_article(article):
+    """
+    重建单篇文章的索引
+    """
+    weights = build_weights(article)
+    with transaction.atomic():
+        ArticleSearchToken.objects.filter(article=article).delete()
+        ArticleSearchToken.objects.bulk_create([
+            ArticleSearchToken(article=article, token=token, weight=weight)
+            for token, weight in weights.items()
+        ], batch_size=1000)
+
+
+def search_articles(query, offset=0, limit=10):
+    """
+    返回 (命中总数, [(article_id, score), ...])
+    """
+    tokens = tokenize_query(query)
+    if not tokens:
+        return 0, []
+
+    document_frequency = dict(
+        ArticleSearchToken.objects
+        .filter(token__in=tokens)
+        .values_list('token')
+        .annotate(df=Count('id'))
+    )
+    # 所有词都必须命中
+    if len(document_frequency) < len(tokens):
+        return 0, []
+
+    total = Article.objects.count()
+    score = Sum(Case(
+        *[
+            When(token=token, then=F('weight') * Value(math.log(1 + total / df)))
+            for token, df in document_frequency.items()
+        ],
+        output_field=FloatField(),
+    ))
+    matches = (
+        ArticleSearchToken.objects
+        .filter(token__in=tokens)
+        .values('article')
+        .annotate(matched=Count('id'), score=score)
+        .filter(matched=len(tokens))
+    )
+    count = matches.count()
+    page = matches.order_by('-score', '-article')[offset:offset + limit]
+    return count, [(row['article'], row['score']) for row in page]
+
+
+def query_terms(query):
+    """
+    用于高亮的查询片段：中文按连续片段，拉丁文按单词
+    """
+    query = normalize(query)
+    terms = CJK_RE.findall(query) + WORD_RE.findall(CJK_RE.sub(' ', query))
+    return sorted(set(terms), key=len, reverse=True)
+
+
+def highlight(text, terms):
+    """
+    转义文本并用 <mark> 包裹命中的查询片段
+    """
+    if not terms:
+        return escape(text)
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group(0))}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return ''.join(parts)
+
+
+def snippet(text, terms, length=SNIPPET_LENGTH):
+    """
+    截取第一个命中位置附近的文字并高亮
+    """
+    text = ' '.join((text or '').split())
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in terms]
+    positions = [position for position in positions if position >= 0]
+    start = max(min(positions) - length // 4, 0) if positions else 0
+    end = start + length
+    fragment = text[start:end]
+    return (
+        ('…' if start > 0 else '')
+        + highlight(fragment, terms)
+        + ('…' if end < len(text) else '')
+    )
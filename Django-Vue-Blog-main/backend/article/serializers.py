@@ -1,15 +1,37 @@
+from urllib.parse import urlencode
+
+from django.urls import reverse
 from rest_framework import serializers
+from article.mixins import SparseFieldsetSerializerMixin
+from article.images import variant_urls
+from article.pagination import CommentPagination
 from article.models import Article, Category, CoverImage
 from user_info.serializers import UserDescSerializer
 from comment.serializers import CommentSerializer
+from comment.tree import embedded_comments
 from user_info.models import User
 
+class CoverVariantsField(serializers.Field):
+    """
+    封面图各版本的地址（见 article.images），查询集应预取 variants
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return variant_urls(value.variants.all(), self.context.get('request'))
+
+
 class CoverImageSerializer(serializers.ModelSerializer):
+    variants = CoverVariantsField(source='*')
+
     class Meta:
         model = CoverImage
         fields = '__all__'
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     分类序列化器
     """
@@ -47,7 +69,7 @@ class ArticleBaseSerializer(serializers.HyperlinkedModelSerializer):
         return article
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     author = UserDescSerializer(read_only=True)
     coverimage_id = serializers.PrimaryKeyRelatedField(
         source='coverimage',
@@ -72,20 +94,7 @@ class ArticleSerializer(serializers.ModelSerializer):
             'coverimage_id',
             'published'
         ]
-        read_only_fields = ['created_at', 'updated_at']
-
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        if 'coverimage_id' not in data and instance.coverimage:
-            data['coverimage_id'] = instance.coverimage.id
-        
-        # 确保category_id被正确包含
-        if instance.category:
-            data['category_id'] = instance.category.id
-        else:
-            data['category_id'] = None
-            
-        return data
+        read_only_fields = ['created_at', 'updated_at', 'toc']
 
     def create(self, validated_data):
         if 'coverimage' in validated_data:
@@ -118,13 +127,43 @@ class ArticleSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class ArticleDetailSerializer(serializers.ModelSerializer):
+class ArticleListSerializer(ArticleSerializer):
+    """
+    文章列表序列化器，不包含正文
+    """
+    cover_variants = CoverVariantsField(source='coverimage')
+
+    class Meta(ArticleSerializer.Meta):
+        fields = [
+            'id',
+            'title',
+            'created_at',
+            'updated_at',
+            'author',
+            'category_id',
+            'summary',
+            'toc',
+            'coverimage_id',
+            'published',
+            'likes_count',
+            'views_count',
+            'comments_count',
+            'cover_variants'
+        ]
+        read_only_fields = ArticleSerializer.Meta.read_only_fields + [
+            'likes_count', 'views_count', 'comments_count'
+        ]
+
+
+class ArticleDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     文章详情序列化器
+
+    只内嵌最新的若干条顶层评论（settings.ARTICLE_DETAIL_COMMENTS），
+    comments_next 为评论列表接口的下一页地址，评论总数见 comments_count
     """
-    comments = CommentSerializer(many=True, read_only=True)
-    body_html = serializers.SerializerMethodField()
-    toc_html = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
+    comments_next = serializers.SerializerMethodField()
     author = UserDescSerializer(read_only=True)
     coverimage_id = serializers.PrimaryKeyRelatedField(
         source='coverimage',
@@ -133,12 +172,6 @@ class ArticleDetailSerializer(serializers.ModelSerializer):
         allow_null=True
     )
 
-    def get_body_html(self, obj):
-        return obj.get_md()[0]
-    
-    def get_toc_html(self, obj):
-        return obj.get_md()[1]
-    
     class Meta:
         model = Article
         fields = [
@@ -154,28 +187,35 @@ class ArticleDetailSerializer(serializers.ModelSerializer):
             'coverimage_id',
             'published',
             'comments',
+            'comments_next',
             'body_html',
-            'toc_html'
+            'toc_html',
+            'likes_count',
+            'views_count',
+            'comments_count'
+        ]
+        read_only_fields = [
+            'created_at', 'updated_at', 'toc', 'body_html', 'toc_html',
+            'likes_count', 'views_count', 'comments_count'
         ]
-        read_only_fields = ['created_at', 'updated_at']
-
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        if 'coverimage_id' not in data and instance.coverimage:
-            data['coverimage_id'] = instance.coverimage.id
-        
-        # 确保category_id被正确包含
-        if instance.category:
-            data['category_id'] = instance.category.id
-        else:
-            data['category_id'] = None
-            
-        return data
 
+    def get_comments(self, obj):
+        comments, _ = embedded_comments(obj)
+        return CommentSerializer(comments, many=True, context=self.context).data
 
+    def get_comments_next(self, obj):
+        comments, has_more = embedded_comments(obj)
+        if not has_more:
+            return None
+        url = '{}?{}'.format(
+            reverse('article-comments', kwargs={'pk': obj.pk}),
+            urlencode({'cursor': CommentPagination().cursor_after(comments[-1])}),
+        )
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
 
 
-class CategoryDetailSerializer(serializers.ModelSerializer):
+class CategoryDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     articles = serializers.SerializerMethodField()
 
     class Meta:
@@ -183,14 +223,19 @@ class CategoryDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'articles']
 
     def get_articles(self, obj):
-        articles = obj.articles.all()
-        return ArticleSerializer(articles, many=True).data
+        articles = obj.articles.select_related('author').prefetch_related('coverimage__variants')
+        return ArticleListSerializer(articles, many=True).data
 
 class ArticleStatsSerializer(serializers.ModelSerializer):
-    likes_count = serializers.IntegerField(read_only=True)
-    views_count = serializers.IntegerField(read_only=True)
-    comments_count = serializers.IntegerField(read_only=True)
+    """
+    文章统计，计数来自 article.stats.stats_queryset 的注解
+    """
+    likes_count = serializers.IntegerField(source='like_total', read_only=True)
+    views_count = serializers.IntegerField(source='view_total', read_only=True)
+    comments_count = serializers.IntegerField(source='comment_total', read_only=True)
+    # HyperLogLog 估计值，由视图计算后赋值
+    unique_visitors = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Article
-        fields = ['id', 'title', 'created_at', 'likes_count', 'views_count', 'comments_count']
\ No newline at end of file
+        fields = ['id', 'title', 'created_at', 'likes_count', 'views_count', 'comments_count', 'unique_visitors']
\ No newline at end of file
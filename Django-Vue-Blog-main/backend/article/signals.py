@@ -0,0 +1,94 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from article.cache import bump
+from article.counters import increment
+from article.images import schedule_variants
+from article.models import Article, ArticleLike, ArticleView, Category, CoverImage
+from article.search import index_article
+from comment.models import Comment
+from comment.tree import detach_descendants
+
+
+@receiver(post_save, sender=Article)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """
+    文章的标题、摘要或正文变化时更新检索索引，删除时由外键级联清理
+
+    与加载时的值比较，只修改分类、发布状态等字段的保存不会重建索引
+    """
+    if not instance.search_fields_changed(update_fields):
+        return
+    index_article(instance)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article(sender, instance, **kwargs):
+    bump('articles', f'article:{instance.pk}', f'comments:{instance.pk}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    # 删除分类会通过 SET_NULL 批量修改文章，不会触发文章的信号
+    bump('categories')
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    bump('articles', f'article:{instance.article_id}', f'comments:{instance.article_id}')
+
+
+@receiver(post_save, sender=ArticleLike)
+@receiver(post_delete, sender=ArticleLike)
+def invalidate_like(sender, instance, **kwargs):
+    bump('articles', f'article:{instance.article_id}')
+
+
+COUNTERS = {
+    ArticleLike: 'likes_count',
+    ArticleView: 'views_count',
+    Comment: 'comments_count',
+}
+
+
+def is_article_deletion(origin):
+    return isinstance(origin, Article) or getattr(origin, 'model', None) is Article
+
+
+@receiver(post_save, sender=ArticleLike)
+@receiver(post_save, sender=ArticleView)
+@receiver(post_save, sender=Comment)
+def increment_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(instance.article_id, COUNTERS[sender], 1)
+
+
+# 阅读量只增不减：原始阅读记录汇总到 ArticleViewDaily 后会被删除
+@receiver(post_delete, sender=ArticleLike)
+@receiver(post_delete, sender=Comment)
+def decrement_counter(sender, instance, origin=None, **kwargs):
+    # 删除文章时级联删除的记录不再计数，避免为已删除的文章写入分片
+    if is_article_deletion(origin):
+        return
+    increment(instance.article_id, COUNTERS[sender], -1)
+
+
+@receiver(post_delete, sender=Comment)
+def detach_replies(sender, instance, origin=None, **kwargs):
+    # 删除文章时评论全部级联删除，无需更新路径
+    if is_article_deletion(origin):
+        return
+    detach_descendants(instance)
+
+
+@receiver(post_save, sender=CoverImage)
+def generate_cover_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    上传或替换封面图后生成缩放版本，原图未变化时生成任务直接返回
+    """
+    if raw or (update_fields is not None and 'content' not in update_fields):
+        return
+    schedule_variants(instance.pk)
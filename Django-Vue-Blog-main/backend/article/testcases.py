@@ -0,0 +1,65 @@
+"""
+测试共用的基类：构造用户、分类、文章和评论，统计请求的查询次数
+
+每个用例开始前清空 Django 缓存和响应缓存，缓存的代与响应不会在用例之间残留。
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from article.cache import get_backend
+from article.models import Article, Category
+from comment.models import Comment
+from user_info.models import User
+
+
+class BlogTestCase(APITestCase):
+    """
+    文章相关接口测试的基类
+    """
+
+    def setUp(self):
+        cache.clear()
+        get_backend().clear()
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='password')
+            for i in range(3)
+        ]
+        self.category = Category.objects.create(name='技术')
+
+    def create_article(self, **kwargs):
+        fields = {
+            'title': 'title',
+            'summary': 'summary',
+            'body': 'body',
+            'author': self.users[0],
+            **kwargs,
+        }
+        return Article.objects.create(**fields)
+
+    def create_comments(self, article, count, **kwargs):
+        return [
+            Comment.objects.create(
+                article=article,
+                user=self.users[i % len(self.users)],
+                content=f'comment {i}',
+                **kwargs,
+            )
+            for i in range(count)
+        ]
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, grow):
+        """
+        先请求一次记录查询次数，扩充数据后再次请求，两次应相同
+        """
+        before = self.count_queries(url)
+        grow()
+        after = self.count_queries(url)
+        self.assertEqual(before, after, f'{url} 的查询次数随数据量增长: {before} -> {after}')
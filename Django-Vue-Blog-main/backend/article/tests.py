@@ -0,0 +1,1139 @@
+import csv
+import datetime
+import io
+import os
+import re
+import tempfile
+import zlib
+from base64 import b64encode
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from article import highlight, rendering, rollups, tracking
+from article.preview import build_preview
+from article.search import search_articles, tokenize_query
+from article.stats import stats_queryset
+from article.rendering import RenderTimeout, render
+from article.toc import extract_toc
+from article.visitors import daily_unique_visitors, unique_visitors
+from article.counters import fold_shards, increment, reconcile
+from article.images import generate_variants
+from article.hll import STANDARD_ERROR, HyperLogLog, hash_value
+from article.likes import MAX_BATCH_SIZE, like, unlike
+from article.models import (
+    Article, ArticleCounterShard, ArticleLike, ArticleView, ArticleViewDaily,
+    ArticleViewHourly, Category, CoverImage, CoverImageVariant,
+)
+from article.testcases import BlogTestCase
+from user_info.models import User
+
+
+class QueryCountTestCase(BlogTestCase):
+    """
+    数据量增长时各接口的查询次数应保持不变
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.coverimage = CoverImage.objects.create(content='coverimage/test.png')
+
+    def create_articles(self, count):
+        return [
+            self.create_article(
+                title=f'title {i}',
+                body=f'# heading {i}\n\nbody',
+                author=self.users[i % len(self.users)],
+                category=self.category,
+                coverimage=self.coverimage,
+            )
+            for i in range(count)
+        ]
+
+    def test_article_list(self):
+        self.create_articles(2)
+        self.assertConstantQueries('/api/article/', lambda: self.create_articles(8))
+
+    def test_article_list_with_fields(self):
+        self.create_articles(2)
+        self.assertConstantQueries(
+            '/api/article/?fields=id,title,author',
+            lambda: self.create_articles(8)
+        )
+
+    def test_article_detail(self):
+        article = self.create_articles(1)[0]
+        self.create_comments(article, 2)
+        self.assertConstantQueries(
+            f'/api/article/{article.id}/',
+            lambda: self.create_comments(article, 10)
+        )
+
+    def test_article_comments(self):
+        article = self.create_articles(1)[0]
+        self.create_comments(article, 2)
+        self.assertConstantQueries(
+            f'/api/article/{article.id}/comments/',
+            lambda: self.create_comments(article, 10)
+        )
+
+    def test_category_list(self):
+        self.assertConstantQueries(
+            '/api/category/',
+            lambda: [Category.objects.create(name=f'分类 {i}') for i in range(5)]
+        )
+
+    def test_category_detail(self):
+        self.create_articles(2)
+        self.assertConstantQueries(
+            f'/api/category/{self.category.id}/',
+            lambda: self.create_articles(8)
+        )
+
+    def test_category_articles(self):
+        self.create_articles(2)
+        self.assertConstantQueries(
+            f'/api/category/{self.category.id}/articles/',
+            lambda: self.create_articles(8)
+        )
+
+
+class SparseFieldsetTestCase(BlogTestCase):
+    """
+    ?fields= / ?exclude= 只输出剩余字段，外键列照常读取但不额外输出
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article(category=self.category)
+
+    def get_keys(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return set(data['results'][0] if 'results' in data else data)
+
+    def test_fields(self):
+        self.assertEqual(self.get_keys('/api/article/?fields=id,title'), {'id', 'title'})
+        self.assertEqual(
+            self.get_keys(f'/api/article/{self.article.id}/?fields=id,title'),
+            {'id', 'title'}
+        )
+
+    def test_exclude(self):
+        keys = self.get_keys('/api/article/?exclude=toc,author,category_id,coverimage_id')
+        self.assertFalse(keys & {'toc', 'author', 'category_id', 'coverimage_id'})
+        self.assertIn('title', keys)
+        keys = self.get_keys(f'/api/article/{self.article.id}/?exclude=category_id,coverimage_id')
+        self.assertFalse(keys & {'category_id', 'coverimage_id'})
+
+    def test_nested_comments_not_trimmed(self):
+        comment = self.create_comments(self.article, 1)[0]
+        data = self.client.get(f'/api/article/{self.article.id}/?fields=id,title,comments').json()
+        self.assertEqual(set(data), {'id', 'title', 'comments'})
+        self.assertEqual(data['comments'][0]['id'], comment.id)
+        self.assertEqual(data['comments'][0]['content'], 'comment 0')
+
+        data = self.client.get(f'/api/article/{self.article.id}/?exclude=id').json()
+        self.assertNotIn('id', data)
+        self.assertEqual(data['comments'][0]['id'], comment.id)
+
+    def test_foreign_keys_without_fields(self):
+        data = self.client.get('/api/article/').json()['results'][0]
+        self.assertEqual(data['category_id'], self.article.category_id)
+        self.assertIsNone(data['coverimage_id'])
+
+
+class CounterValidatorTestCase(BlogTestCase):
+    """
+    计数变化后，包含计数的响应不能再返回 304
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article(category=self.category)
+
+    def like(self):
+        self.client.force_authenticate(self.users[1])
+        response = self.client.post(f'/api/article/{self.article.id}/like/')
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(None)
+
+    def assertChangedAfterLike(self, url):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.like()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_category_detail(self):
+        self.assertChangedAfterLike(f'/api/category/{self.category.id}/')
+
+    def test_category_articles(self):
+        url = f'/api/category/{self.category.id}/articles/'
+        self.assertChangedAfterLike(url)
+        self.assertEqual(self.client.get(url).json()[0]['likes_count'], 1)
+
+    def test_article_detail(self):
+        self.assertChangedAfterLike(f'/api/article/{self.article.id}/')
+
+    def test_no_last_modified_on_counted_responses(self):
+        for url in [
+            f'/api/article/{self.article.id}/',
+            f'/api/article/{self.article.id}/comments/',
+            f'/api/category/{self.category.id}/',
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('Last-Modified', response)
+
+        url = f'/api/article/{self.article.id}/'
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.like()
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+
+class ConditionalGetTestCase(BlogTestCase):
+    """
+    ETag 条件请求：未修改时返回 304，校验值不聚合整张表
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article(category=self.category)
+
+    def get_etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_lists_without_table_queries(self):
+        for url in ['/api/article/', '/api/category/']:
+            etag = self.get_etag(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_article_list_changes(self):
+        etag = self.get_etag('/api/article/')
+        self.create_article(title='new')
+        self.assertNotEqual(self.get_etag('/api/article/'), etag)
+
+    def test_category_list_changes(self):
+        etag = self.get_etag('/api/category/')
+        self.category.description = 'changed'
+        self.category.save()
+        self.assertNotEqual(self.get_etag('/api/category/'), etag)
+
+    def test_article_detail_one_query(self):
+        # 登录用户的请求不走响应缓存，由校验值判断
+        self.client.force_authenticate(self.users[0])
+        url = f'/api/article/{self.article.id}/'
+        etag = self.get_etag(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_changes(self):
+        comment = self.create_comments(self.article, 1)[0]
+        for url in [f'/api/article/{self.article.id}/', f'/api/article/{self.article.id}/comments/']:
+            etag = self.get_etag(url)
+            comment.content = f'edited {url}'
+            comment.save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.get_etag(f'/api/article/{self.article.id}/comments/')
+        comment.delete()
+        response = self.client.get(
+            f'/api/article/{self.article.id}/comments/', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_missing_article(self):
+        self.assertEqual(self.client.get('/api/article/999999/').status_code, 404)
+        self.assertEqual(self.client.get('/api/article/999999/comments/').status_code, 404)
+
+
+class RenderManyTestCase(SimpleTestCase):
+    """
+    批量渲染：单篇文档的失败或导致进程池损坏都只影响它自己
+    """
+
+    def test_error_in_one_document(self):
+        results = {
+            key: html
+            for key, html, _ in rendering.render_many([(1, '# a'), (2, None)], max_workers=1)
+        }
+        self.assertIn('<h1', results[1])
+        self.assertIsNone(results[2])
+
+    def test_broken_pool_retries_unfinished(self):
+        calls = []
+
+        def fake_pool(items, timeout, max_workers, unfinished):
+            # 含 bad 的多进程池整体损坏；单进程池依次渲染，到 bad 时损坏
+            calls.append((max_workers, [key for key, _ in items]))
+            for index, (key, text) in enumerate(items):
+                if text == 'bad':
+                    unfinished.extend(items[index:] if max_workers == 1 else items)
+                    if max_workers != 1:
+                        return
+                    break
+            else:
+                index = len(items)
+            for key, text in items[:index]:
+                yield key, text.upper(), ''
+
+        items = [(1, 'a'), (2, 'bad'), (3, 'c'), (4, 'd')]
+        with mock.patch.object(rendering, '_render_in_new_pool', fake_pool):
+            results = list(rendering.render_many(items, max_workers=2))
+
+        self.assertEqual(sorted(key for key, _, _ in results), [1, 2, 3, 4])
+        self.assertEqual(
+            {key: html for key, html, _ in results},
+            {1: 'A', 2: None, 3: 'C', 4: 'D'}
+        )
+        self.assertEqual([workers for workers, _ in calls], [2, 2, 1, 1])
+        self.assertEqual(calls[-1][1], [3, 4])
+
+    def test_queueing_does_not_count_against_budget(self):
+        future = mock.Mock()
+        future.result.return_value = ('<p>a</p>', '')
+        executor = mock.Mock()
+        executor.submit.return_value = future
+        with mock.patch.object(rendering, 'get_executor', return_value=executor):
+            rendering.render_markdown('a', timeout=5)
+        wait = future.result.call_args.kwargs['timeout']
+        self.assertEqual(wait, 5 + rendering.WATCHDOG_GRACE + rendering.QUEUE_TIMEOUT)
+
+
+@override_settings(MARKDOWN_RENDER_TIMEOUT=None)
+class PreviewTestCase(BlogTestCase):
+    """
+    增量预览：只下发会话中新出现的段落，渲染失败的段落不缓存
+    """
+
+    body = '# 第一节\n\n段落一\n\n# 第二节\n\n段落二\n'
+
+    def test_only_changed_sections(self):
+        first = build_preview(self.body)
+        self.assertEqual(len(first['sections']), 2)
+        self.assertEqual(set(first['changed']), set(first['sections']))
+
+        second = build_preview(self.body.replace('段落二', '段落三'), first['session'])
+        self.assertEqual(second['sections'][0], first['sections'][0])
+        self.assertEqual(list(second['changed']), [second['sections'][1]])
+        self.assertIn('段落三', second['changed'][second['sections'][1]])
+
+    def test_anchors_numbered_across_document(self):
+        body = '# 标题\n\n一\n\n# 标题\n\n二\n'
+        preview = build_preview(body)
+        html = ''.join(preview['changed'][digest] for digest in preview['sections'])
+        anchors = [heading['anchor'] for heading in preview['toc']]
+        self.assertEqual(len(set(anchors)), 2)
+        for anchor in anchors:
+            self.assertIn(f'id="{anchor}"', html)
+
+    def test_failed_section_not_cached(self):
+        def render_first_only(texts, **kwargs):
+            return [render(texts[0])] + [None] * (len(texts) - 1)
+
+        with mock.patch('article.preview.render_sections', side_effect=render_first_only):
+            first = build_preview(self.body)
+        ok, failed = first['sections']
+        self.assertTrue(first['changed'][failed].startswith('<pre>'))
+        self.assertEqual(first['toc_html'], '')
+
+        second = build_preview(self.body, first['session'])
+        self.assertEqual(list(second['changed']), [failed])
+        self.assertNotIn('<pre>', second['changed'][failed])
+
+
+class SectionBudgetTestCase(SimpleTestCase):
+    """
+    片段逐个计时，超时的片段不影响其他片段
+    """
+
+    def test_timeout_per_section(self):
+        results = rendering._render_each_with_alarm(['# a', 'x\n\n' * 200000, '# b'], 0.05)
+        self.assertIn('<h1', results[0][0])
+        self.assertIsNone(results[1])
+        self.assertIn('<h1', results[2][0])
+
+
+@override_settings(MARKDOWN_RENDER_TIMEOUT=None)
+class TocTestCase(BlogTestCase):
+    """
+    extract_toc 的锚点与 body_html 中标题的 id 一致
+    """
+
+    def test_anchors_match_rendered_ids(self):
+        body = '\n\n'.join([
+            '# a_b_c and __init__',
+            '## _em_ and *star* and **bold**',
+            '## snake_case_name',
+            '## `code` and [link](https://example.com)',
+            '## 中文 标题',
+            '## 中文 标题',
+            '```\n# not a heading\n```',
+            'Setext\n------',
+            '### custom {#custom-id}',
+        ])
+        article = self.create_article(body=body)
+        ids = re.findall(r'<h[1-6][^>]*\bid="([^"]*)"', article.body_html)
+        self.assertEqual([heading['anchor'] for heading in extract_toc(body)], ids)
+        self.assertEqual([heading['anchor'] for heading in article.toc], ids)
+        self.assertEqual(ids[0], 'a_b_c-and-init')
+
+
+@override_settings(MARKDOWN_RENDER_TIMEOUT=None)
+class PrerenderedBodyTestCase(BlogTestCase):
+    """
+    保存时预渲染正文，正文不变时不重新渲染
+    """
+
+    def test_rendered_on_save(self):
+        article = self.create_article(body='# Title\n\n正文')
+        self.assertIn('<h1 id="title">Title</h1>', article.body_html)
+        self.assertIn('href="#title"', article.toc_html)
+        self.assertEqual(article.toc, [{'level': 1, 'text': 'Title', 'anchor': 'title'}])
+        self.assertEqual(article.body_hash, Article.hash_body(article.body))
+
+        data = self.client.get(f'/api/article/{article.id}/').json()
+        self.assertEqual(data['body_html'], article.body_html)
+        self.assertEqual(data['toc_html'], article.toc_html)
+
+    def test_unchanged_body_not_rendered(self):
+        article = self.create_article(body='# 标题')
+        with mock.patch.object(Article, 'get_md') as get_md:
+            article.title = 'changed'
+            article.save()
+            Article.objects.get(pk=article.pk).save()
+        get_md.assert_not_called()
+
+        with mock.patch.object(Article, 'get_md', return_value=('<p>new</p>', '')) as get_md:
+            article.body = 'new'
+            article.save()
+        get_md.assert_called_once()
+        self.assertEqual(Article.objects.get(pk=article.pk).body_html, '<p>new</p>')
+
+    def test_render_failure_falls_back_to_text(self):
+        with mock.patch.object(Article, 'get_md', side_effect=RenderTimeout()):
+            article = self.create_article(body='# <b>x</b>')
+        self.assertEqual(article.body_html, '<pre># &lt;b&gt;x&lt;/b&gt;</pre>')
+        self.assertEqual(article.body_hash, '')
+        # 之后的保存会重新尝试渲染
+        article.save()
+        self.assertIn('<h1', Article.objects.get(pk=article.pk).body_html)
+
+
+class HighlightCacheTestCase(SimpleTestCase):
+    """
+    代码块高亮按内容缓存，只有改动过的代码块重新高亮
+    """
+
+    def setUp(self):
+        highlight.highlight_cache.clear()
+
+    def test_unchanged_blocks_reuse_cache(self):
+        code = '```python\nprint(1)\n```\n\n```js\nlet a = 1\n```\n'
+        with mock.patch(
+            'markdown.extensions.codehilite.highlight',
+            wraps=highlight.codehilite.highlight
+        ) as pygments_highlight:
+            first, _ = render('# a\n\n' + code)
+            self.assertEqual(pygments_highlight.call_count, 2)
+
+            second, _ = render('# b\n\n' + code)
+            self.assertEqual(pygments_highlight.call_count, 2)
+            self.assertEqual(first.split('</h1>')[1], second.split('</h1>')[1])
+
+            render(code.replace('print(1)', 'print(2)'))
+            self.assertEqual(pygments_highlight.call_count, 3)
+
+        self.assertEqual(len(highlight.highlight_cache), 3)
+        self.assertIn('codehilite', first)
+
+
+class KeysetPaginationTestCase(BlogTestCase):
+    """
+    文章列表的游标分页：相同创建时间的文章不重复不遗漏，非法游标返回 404
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.articles = [self.create_article(title=f'title {i}') for i in range(5)]
+        # 一半文章的创建时间相同，只能靠 id 区分先后
+        Article.objects.filter(pk__in=[article.pk for article in self.articles[1:4]]).update(
+            created_at=timezone.now()
+        )
+
+    def collect(self, url, link='next'):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(item['id'] for item in data['results'])
+            url = data[link]
+        return ids
+
+    def expected_ids(self):
+        return list(Article.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def test_pages_cover_all_articles(self):
+        self.assertEqual(self.collect('/api/article/?page_size=2'), self.expected_ids())
+
+    def test_previous_pages(self):
+        first = self.client.get('/api/article/?page_size=2').json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_filter_by_category(self):
+        Article.objects.filter(pk__in=[self.articles[0].pk, self.articles[2].pk]).update(
+            category=self.category
+        )
+        ids = self.collect(f'/api/article/?category={self.category.id}&page_size=1')
+        self.assertEqual(sorted(ids), [self.articles[0].pk, self.articles[2].pk])
+
+    def test_invalid_cursor(self):
+        def encode(value):
+            return b64encode(value.encode('utf-8')).decode('ascii')
+
+        for cursor in [
+            'not-base64!',
+            encode('[0, ["x"]]'),
+            encode('[0, ["not a date", "x"]]'),
+            encode('[0, [null, 1]]'),
+        ]:
+            response = self.client.get('/api/article/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class SearchTestCase(BlogTestCase):
+    """
+    全文检索：中文按二元组匹配，所有词都须命中，标题权重高于正文
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.in_title = self.create_article(title='全文检索入门', body='介绍 Django')
+        self.in_body = self.create_article(title='杂记', body='今天实现了全文检索和 Django 缓存')
+        self.other = self.create_article(title='缓存', body='Redis')
+
+    def hit_ids(self, query):
+        return [article_id for article_id, _ in search_articles(query)[1]]
+
+    def test_tokenize_query(self):
+        self.assertEqual(tokenize_query('全文检索 Django'), ['全文', '文检', '检索', 'django'])
+        self.assertEqual(tokenize_query('字'), ['字'])
+
+    def test_ranking_and_all_terms(self):
+        self.assertEqual(self.hit_ids('全文检索'), [self.in_title.id, self.in_body.id])
+        self.assertEqual(self.hit_ids('检索 缓存'), [self.in_body.id])
+        self.assertEqual(self.hit_ids('不存在'), [])
+
+    def test_endpoint(self):
+        data = self.client.get('/api/article/search/', {'q': '检索'}).json()
+        self.assertEqual(data['count'], 2)
+        first = data['results'][0]
+        self.assertEqual(first['id'], self.in_title.id)
+        self.assertEqual(first['title_html'], '全文<mark>检索</mark>入门')
+        self.assertNotIn('body', first)
+
+    def test_index_follows_text_changes(self):
+        self.in_title.body = 'Elasticsearch'
+        self.in_title.save()
+        self.assertEqual(self.hit_ids('elasticsearch'), [self.in_title.id])
+
+    def test_metadata_save_skips_reindex(self):
+        article = Article.objects.get(pk=self.other.pk)
+        with mock.patch('article.signals.index_article') as index_article:
+            article.category = self.category
+            article.published = True
+            article.save()
+            self.client.force_authenticate(self.users[0])
+            response = self.client.put(
+                f'/api/article/update_meta/{article.id}/',
+                {'category_id': self.category.id},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        index_article.assert_not_called()
+
+
+class ResponseCacheTestCase(BlogTestCase):
+    """
+    匿名只读请求的响应缓存，相关资源变化时按代失效
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article(category=self.category)
+
+    def test_hit_without_queries(self):
+        for url in [
+            '/api/article/',
+            f'/api/article/{self.article.id}/',
+            f'/api/article/{self.article.id}/comments/',
+            '/api/category/',
+            f'/api/category/{self.category.id}/',
+        ]:
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(second.content, first.content, url)
+
+    def test_invalidated_by_changes(self):
+        url = f'/api/article/{self.article.id}/'
+        self.client.get(url)
+        self.article.title = 'changed'
+        self.article.save()
+        self.assertEqual(self.client.get(url).json()['title'], 'changed')
+
+        self.client.get('/api/article/')
+        self.create_comments(self.article, 1)
+        self.assertEqual(self.client.get(url).json()['comments_count'], 1)
+        self.assertEqual(self.client.get('/api/article/').json()['results'][0]['comments_count'], 1)
+
+        self.client.get('/api/category/')
+        self.category.name = '后端'
+        self.category.save()
+        names = {item['id']: item['name'] for item in self.client.get('/api/category/').json()}
+        self.assertEqual(names[self.category.id], '后端')
+
+    def test_query_string_in_key(self):
+        full = self.client.get('/api/article/').json()['results'][0]
+        sparse = self.client.get('/api/article/?fields=id').json()['results'][0]
+        self.assertEqual(set(sparse), {'id'})
+        self.assertIn('title', full)
+
+    def test_authenticated_not_cached(self):
+        self.client.force_authenticate(self.users[0])
+        self.client.get('/api/article/')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/article/')
+        self.assertGreater(len(context.captured_queries), 0)
+
+
+class CounterTestCase(BlogTestCase):
+    """
+    冗余计数随点赞、评论增减，分片与校正结果一致
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+
+    def counts(self):
+        return Article.objects.values_list(*Article.COUNTER_FIELDS).get(pk=self.article.pk)
+
+    def test_likes_and_comments(self):
+        like = ArticleLike.objects.create(article=self.article, user=self.users[1])
+        comments = self.create_comments(self.article, 2)
+        self.assertEqual(self.counts(), (1, 0, 2))
+        like.delete()
+        comments[0].delete()
+        self.assertEqual(self.counts(), (0, 0, 1))
+
+    def test_save_keeps_counters(self):
+        stale = Article.objects.get(pk=self.article.pk)
+        self.create_comments(self.article, 3)
+        stale.title = 'changed'
+        stale.save()
+        self.assertEqual(self.counts(), (0, 0, 3))
+
+    def test_never_negative(self):
+        increment(self.article.pk, 'likes_count', -5)
+        self.assertEqual(self.counts(), (0, 0, 0))
+        with self.assertRaises(ValueError):
+            increment(self.article.pk, 'title', 1)
+
+    @override_settings(ARTICLE_COUNTER_SHARDS=4)
+    def test_shards_fold(self):
+        for _ in range(10):
+            increment(self.article.pk, 'views_count')
+        self.assertEqual(self.counts(), (0, 0, 0))
+        self.assertLessEqual(ArticleCounterShard.objects.count(), 4)
+        self.assertEqual(fold_shards(), [self.article.pk])
+        self.assertEqual(self.counts(), (0, 10, 0))
+        self.assertFalse(ArticleCounterShard.objects.exists())
+
+    def test_reconcile(self):
+        ArticleLike.objects.create(article=self.article, user=self.users[1])
+        self.create_comments(self.article, 2)
+        Article.objects.filter(pk=self.article.pk).update(likes_count=7, comments_count=0)
+        self.assertEqual(reconcile([self.article.pk]), 1)
+        self.assertEqual(self.counts(), (1, 0, 2))
+
+    def test_article_delete_cascades(self):
+        ArticleLike.objects.create(article=self.article, user=self.users[1])
+        self.create_comments(self.article, 2)
+        self.article.delete()
+        self.assertFalse(ArticleCounterShard.objects.exists())
+
+
+class ViewBufferTestCase(BlogTestCase):
+    """
+    阅读记录先进入缓冲区，按条数或手动 flush 批量写入
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        self.buffer = tracking.ViewBuffer(flush_size=3, flush_interval=0, max_size=5)
+
+    def views_count(self):
+        return Article.objects.get(pk=self.article.pk).views_count
+
+    def test_flush(self):
+        self.buffer.record(self.article.pk, hash_value('visitor'))
+        self.buffer.record(999999)
+        self.assertEqual(ArticleView.objects.count(), 0)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(ArticleView.objects.count(), 1)
+        self.assertEqual(self.views_count(), 1)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_flush_size(self):
+        for _ in range(3):
+            self.buffer.record(self.article.pk)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.views_count(), 3)
+
+    def test_max_size_drops(self):
+        buffer = tracking.ViewBuffer(flush_size=100, flush_interval=0, max_size=2)
+        results = [buffer.record(self.article.pk) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(buffer.dropped, 1)
+
+    def test_failed_flush_restores(self):
+        self.buffer.record(self.article.pk)
+        with mock.patch.object(tracking, 'write_views', side_effect=RuntimeError):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(self.buffer.flush(), 1)
+
+    def test_endpoint(self):
+        with mock.patch.object(tracking, 'get_buffer', return_value=self.buffer):
+            response = self.client.post(f'/api/article/{self.article.pk}/view/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'status': 'recorded'})
+        self.assertEqual(len(self.buffer), 1)
+
+
+class RollupTestCase(BlogTestCase):
+    """
+    汇总后原始记录被删除，按天、按小时的序列与汇总前一致
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        self.yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        start = rollups.day_start(self.yesterday)
+        for hours, minutes in ((-1, 30), (10, 15), (10, 45), (11, 5)):
+            ArticleView.objects.create(
+                article=self.article,
+                viewed_at=start + datetime.timedelta(hours=hours, minutes=minutes),
+            )
+
+    def series(self, interval):
+        return rollups.view_series(
+            self.article.pk, self.yesterday - datetime.timedelta(days=1), self.yesterday, interval
+        )
+
+    def test_rollup_keeps_series(self):
+        days = self.series('day')
+        hours = self.series('hour')
+        self.assertEqual([views for _, views in days], [1, 3])
+        self.assertEqual(rollups.rollup_views(timezone.now(), chunk_size=3), 4)
+        self.assertFalse(ArticleView.objects.exists())
+        self.assertEqual(ArticleViewHourly.objects.count(), 3)
+        self.assertEqual(ArticleViewDaily.objects.count(), 2)
+        self.assertEqual(self.series('day'), days)
+        self.assertEqual(self.series('hour'), hours)
+
+    def test_rollup_adds_to_existing_buckets(self):
+        rollups.rollup_views(timezone.now())
+        ArticleView.objects.create(
+            article=self.article,
+            viewed_at=rollups.day_start(self.yesterday) + datetime.timedelta(hours=10),
+        )
+        # 未汇总的原始记录也计入序列
+        self.assertEqual([views for _, views in self.series('day')], [1, 4])
+        self.assertEqual(rollups.rollup_views(timezone.now()), 1)
+        self.assertEqual(
+            ArticleViewDaily.objects.get(article=self.article, day=self.yesterday).views, 4
+        )
+
+    def test_rollup_before(self):
+        before = rollups.day_start(self.yesterday)
+        self.assertEqual(rollups.rollup_views(before), 1)
+        self.assertEqual(ArticleView.objects.count(), 3)
+        self.assertEqual([views for _, views in self.series('day')], [1, 3])
+
+    def test_prune_hourly(self):
+        rollups.rollup_views(timezone.now())
+        self.assertEqual(rollups.prune_hourly(rollups.day_start(self.yesterday)), 1)
+        self.assertEqual(ArticleViewHourly.objects.count(), 2)
+        # 按天的序列不受影响
+        self.assertEqual([views for _, views in self.series('day')], [1, 3])
+
+    def test_command_archive(self):
+        current = ArticleView.objects.create(article=self.article)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'views.csv')
+            call_command('rollup_article_views', archive=path, stdout=io.StringIO())
+            with open(path, newline='') as archive:
+                rows = list(csv.reader(archive))
+        self.assertEqual(len(rows), 4)
+        # 当前小时的记录保留
+        self.assertEqual(list(ArticleView.objects.values_list('pk', flat=True)), [current.pk])
+
+    def test_view_stats_endpoint(self):
+        url = f'/api/article/{self.article.pk}/views/?start={self.yesterday}&end={self.yesterday}'
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        admin = User.objects.create_superuser(username='admin', password='password')
+        self.client.force_authenticate(admin)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(
+            self.client.get(url + '&interval=minute').status_code,
+            400
+        )
+
+
+class StatsTestCase(BlogTestCase):
+    """
+    每项指标单独计算，点赞、阅读、评论之间不会相乘
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        self.other = self.create_article(title='other')
+        for user in self.users:
+            ArticleLike.objects.create(article=self.article, user=user)
+        for _ in range(2):
+            ArticleView.objects.create(article=self.article)
+        self.create_comments(self.article, 2)
+        ArticleLike.objects.create(article=self.other, user=self.users[0])
+        reconcile()
+        self.admin = User.objects.create_superuser(username='admin', password='password')
+
+    def totals(self, **kwargs):
+        return list(
+            stats_queryset(**kwargs)
+            .order_by('pk')
+            .values_list('like_total', 'view_total', 'comment_total')
+        )
+
+    def test_totals(self):
+        expected = [(3, 2, 2), (1, 0, 0)]
+        today = timezone.localdate()
+        self.assertEqual(self.totals(), expected)
+        self.assertEqual(self.totals(start=today, end=today), expected)
+        self.assertEqual(self.totals(start=today + datetime.timedelta(days=1)), [(0, 0, 0)] * 2)
+
+    def test_range_includes_rollups(self):
+        rollups.rollup_views(timezone.now() + datetime.timedelta(hours=1))
+        ArticleView.objects.create(article=self.article)
+        today = timezone.localdate()
+        self.assertEqual(self.totals(start=today)[0], (3, 3, 2))
+
+    def test_endpoint(self):
+        url = '/api/article/stats/'
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(url, {'ordering': '-likes_count', 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        [row] = response.data['results']
+        self.assertEqual(row['id'], self.article.pk)
+        self.assertEqual(
+            (row['likes_count'], row['views_count'], row['comments_count'], row['unique_visitors']),
+            (3, 2, 2, 0)
+        )
+        self.assertEqual(
+            self.client.get(response.data['next']).data['results'][0]['id'],
+            self.other.pk
+        )
+
+    def test_invalid_parameters(self):
+        self.client.force_authenticate(self.admin)
+        for params in (
+            {'ordering': 'title'},
+            {'start': '2024-02-01', 'end': '2024-01-01'},
+            {'start': 'yesterday'},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/article/stats/', params).status_code, 400)
+
+
+class HyperLogLogTestCase(SimpleTestCase):
+    """
+    HyperLogLog 估计值的误差、合并与序列化
+    """
+
+    def sketch(self, values):
+        sketch = HyperLogLog()
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def assertClose(self, estimate, actual):
+        self.assertLessEqual(abs(estimate - actual), 3 * STANDARD_ERROR * actual)
+
+    def test_estimate(self):
+        self.assertEqual(HyperLogLog().estimate(), 0)
+        self.assertEqual(self.sketch(['a'] * 100).estimate(), 1)
+        for actual in (100, 20000):
+            with self.subTest(actual=actual):
+                self.assertClose(self.sketch(range(actual)).estimate(), actual)
+
+    def test_merge(self):
+        merged = self.sketch(range(0, 6000)).merge(self.sketch(range(3000, 9000)))
+        self.assertEqual(merged.registers, self.sketch(range(9000)).registers)
+        self.assertClose(merged.estimate(), 9000)
+
+    def test_dump_load(self):
+        sketch = self.sketch(range(500))
+        self.assertEqual(HyperLogLog.load(sketch.dump()).registers, sketch.registers)
+        self.assertEqual(HyperLogLog.load(b'').estimate(), 0)
+        with self.assertRaises(ValueError):
+            HyperLogLog.load(zlib.compress(b'\0' * 16))
+
+
+class UniqueVisitorsTestCase(BlogTestCase):
+    """
+    阅读记录写入时更新文章和每天的访客草图
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - datetime.timedelta(days=1)
+        yesterday_noon = rollups.day_start(self.yesterday) + datetime.timedelta(hours=12)
+        buffer = tracking.ViewBuffer(flush_size=1000, flush_interval=0, max_size=1000)
+        for visitor in ('a', 'b', 'c'):
+            buffer.record(self.article.pk, hash_value(visitor), viewed_at=yesterday_noon)
+        for visitor in ('a', 'a', 'd', None):
+            buffer.record(
+                self.article.pk, visitor and hash_value(visitor), viewed_at=timezone.now()
+            )
+        buffer.flush()
+
+    def test_unique_visitors(self):
+        pk = self.article.pk
+        self.assertEqual(ArticleView.objects.count(), 7)
+        self.assertEqual(unique_visitors([pk]), {pk: 4})
+        self.assertEqual(unique_visitors([pk], start=self.today), {pk: 2})
+        self.assertEqual(unique_visitors([pk], end=self.yesterday), {pk: 3})
+        self.assertEqual(
+            daily_unique_visitors(pk, self.yesterday, self.today),
+            {self.yesterday: 3, self.today: 2}
+        )
+        self.assertEqual(unique_visitors([pk, 999999]), {pk: 4, 999999: 0})
+
+    def test_rollup_keeps_sketch(self):
+        rollups.rollup_views(timezone.now() + datetime.timedelta(hours=1))
+        self.assertEqual(
+            dict(ArticleViewDaily.objects.values_list('day', 'views')),
+            {self.yesterday: 3, self.today: 4}
+        )
+        self.assertEqual(unique_visitors([self.article.pk], start=self.yesterday), {self.article.pk: 4})
+
+
+class LikeTestCase(BlogTestCase):
+    """
+    点赞、取消点赞幂等，批量接口固定查询次数
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        self.url = f'/api/article/{self.article.pk}/like/'
+
+    def test_idempotent(self):
+        self.client.force_authenticate(self.users[1])
+        for _ in range(2):
+            response = self.client.post(self.url)
+            self.assertEqual(response.data, {'status': 'liked', 'is_liked': True, 'like_count': 1})
+        self.assertEqual(ArticleLike.objects.count(), 1)
+        self.assertEqual(self.client.get(self.url).data, {'is_liked': True, 'like_count': 1})
+        for _ in range(2):
+            response = self.client.delete(self.url)
+            self.assertEqual(response.data, {'status': 'unliked', 'is_liked': False, 'like_count': 0})
+        self.assertFalse(ArticleLike.objects.exists())
+
+    def test_like_helpers(self):
+        self.assertTrue(like(self.article, self.users[1]))
+        self.assertFalse(like(self.article, self.users[1]))
+        self.assertTrue(unlike(self.article, self.users[1]))
+        self.assertFalse(unlike(self.article, self.users[1]))
+        self.assertEqual(Article.objects.get(pk=self.article.pk).likes_count, 0)
+
+    def test_anonymous(self):
+        self.assertEqual(self.client.post(self.url).status_code, 401)
+        self.assertEqual(self.client.get('/api/article/999999/like/').status_code, 404)
+
+    def test_batch(self):
+        other = self.create_article(title='other')
+        like(self.article, self.users[0])
+        like(self.article, self.users[1])
+        like(other, self.users[1])
+        self.client.force_authenticate(self.users[0])
+        url = f'/api/article/likes/?ids={other.pk},999999,{self.article.pk},{other.pk}'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(response.data, [
+            {'article_id': other.pk, 'like_count': 1, 'is_liked': False},
+            {'article_id': self.article.pk, 'like_count': 2, 'is_liked': True},
+        ])
+
+    def test_batch_invalid(self):
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.client.get('/api/article/likes/?ids=1,a').status_code, 400)
+        ids = ','.join(str(pk) for pk in range(1, MAX_BATCH_SIZE + 2))
+        self.assertEqual(self.client.get(f'/api/article/likes/?ids={ids}').status_code, 400)
+
+
+@override_settings(ARTICLE_DETAIL_COMMENTS=3)
+class EmbeddedCommentsTestCase(BlogTestCase):
+    """
+    文章详情只内嵌最新的若干条顶层评论，其余由 comments_next 分页获取
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        self.url = f'/api/article/{self.article.pk}/'
+
+    def test_embedded(self):
+        roots = self.create_comments(self.article, 5)
+        self.create_comments(self.article, 1, parent=roots[-1])
+        data = self.client.get(self.url).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [root.pk for root in reversed(roots[2:])]
+        )
+        self.assertEqual(data['comments_count'], 6)
+
+        page = self.client.get(data['comments_next']).json()
+        self.assertEqual(
+            [node['id'] for node in page['results']],
+            [root.pk for root in reversed(roots[:2])]
+        )
+        self.assertIsNone(page['next'])
+
+    def test_no_more(self):
+        roots = self.create_comments(self.article, 3)
+        data = self.client.get(self.url).json()
+        self.assertEqual(len(data['comments']), len(roots))
+        self.assertIsNone(data['comments_next'])
+
+
+@override_settings(COVER_IMAGE_VARIANTS={
+    'WIDTHS': {'thumb': 320, 'large': 1280},
+    'FORMATS': {'webp': 80, 'jpeg': 82},
+    'ASYNC': False,
+})
+class CoverVariantsTestCase(BlogTestCase):
+    """
+    封面图保存后生成缩放、压缩的版本，原图替换后重新生成
+    """
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def image_file(self, size, mode='RGBA', name='cover.png'):
+        buffer = io.BytesIO()
+        Image.new(mode, size, 'red').save(buffer, format='PNG')
+        return ContentFile(buffer.getvalue(), name=name)
+
+    def create_cover(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return CoverImage.objects.create(content=content)
+
+    def variants(self, cover):
+        return {
+            (variant.name, variant.format): variant
+            for variant in CoverImageVariant.objects.filter(image=cover)
+        }
+
+    def test_generate(self):
+        cover = self.create_cover(self.image_file((2000, 1000)))
+        variants = self.variants(cover)
+        self.assertEqual(set(variants), {
+            ('thumb', 'webp'), ('thumb', 'jpeg'), ('large', 'webp'), ('large', 'jpeg'),
+        })
+        thumb = variants[('thumb', 'jpeg')]
+        self.assertEqual((thumb.width, thumb.height), (320, 160))
+        with Image.open(thumb.content.path) as image:
+            self.assertEqual((image.format, image.mode, image.size), ('JPEG', 'RGB', (320, 160)))
+        with Image.open(variants[('large', 'webp')].content.path) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (1280, 640)))
+
+    def test_no_upscale(self):
+        cover = self.create_cover(self.image_file((200, 100), mode='P'))
+        self.assertEqual(
+            {(variant.width, variant.height) for variant in self.variants(cover).values()},
+            {(200, 100)}
+        )
+
+    def test_current_and_replaced(self):
+        cover = self.create_cover(self.image_file((800, 400)))
+        self.assertEqual(generate_variants(cover.pk), 0)
+        old_paths = [variant.content.path for variant in self.variants(cover).values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cover.content = self.image_file((600, 600), name='replaced.png')
+            cover.save()
+        variants = self.variants(cover)
+        self.assertEqual(len(variants), 4)
+        self.assertTrue(all(variant.source == cover.content.name for variant in variants.values()))
+        self.assertEqual(variants[('thumb', 'webp')].height, 320)
+        self.assertFalse(any(os.path.exists(path) for path in old_paths))
+
+    def test_unreadable(self):
+        with self.assertLogs('article.images', 'WARNING'):
+            cover = self.create_cover(ContentFile(b'not an image', name='broken.png'))
+        self.assertEqual(self.variants(cover), {})
+
+    def test_command(self):
+        with mock.patch('article.signals.schedule_variants'):
+            cover = self.create_cover(self.image_file((400, 200)))
+        self.assertEqual(self.variants(cover), {})
+        out = io.StringIO()
+        call_command('generate_cover_variants', stdout=out)
+        self.assertEqual(len(self.variants(cover)), 4)
+        call_command('generate_cover_variants', cover.pk, stdout=out)
+        self.assertIn('已为 0 张', out.getvalue().splitlines()[-1])
+
+    def test_endpoint(self):
+        cover = self.create_cover(self.image_file((2000, 1000)))
+        variants = self.client.get(f'/api/coverimage/{cover.pk}/').json()['variants']
+        self.assertEqual(list(variants), ['thumb', 'large'])
+        self.assertEqual(variants['thumb']['width'], 320)
+        self.assertTrue(variants['thumb']['webp'].startswith('http://testserver/'))
+        self.assertTrue(variants['thumb']['jpeg'].endswith('.jpg'))
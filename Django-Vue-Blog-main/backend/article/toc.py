@@ -0,0 +1,118 @@
+"""
+轻量标题提取
+
+逐行扫描 Markdown 正文得到结构化目录，无需完整渲染。
+锚点使用 toc 扩展相同的 slugify / unique 规则，与 body_html 中标题的 id 一致。
+"""
+import html
+import re
+
+from markdown.extensions.toc import slugify, unique
+
+# 与 Python-Markdown 的 HashHeaderProcessor 一致：# 后不要求空格，结尾的 # 会被去掉
+HEADING_RE = re.compile(r'^(#{1,6})(.*?)#*[ \t]*$')
+SETEXT_RE = re.compile(r'^ {0,3}(=+|-+)[ \t]*$')
+FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+# attr_list 扩展的 {#id} / {: #id .class}
+ATTR_LIST_RE = re.compile(r'[ \t]*\{:?[ \t]*([^}]*)\}[ \t]*$')
+ATTR_ID_RE = re.compile(r'#([\w:-]+)')
+
+INLINE_PATTERNS = [
+    (re.compile(r'!\[([^\]]*)\]\([^)]*\)'), r'\1'),        # 图片
+    (re.compile(r'\[([^\]]*)\](?:\([^)]*\)|\[[^\]]*\])'), r'\1'),  # 链接
+    (re.compile(r'`+([^`]*)`+'), r'\1'),                  # 行内代码
+    (re.compile(r'(\*{1,3})(\S.*?\S|\S)\1'), r'\2'),        # 强调
+    # 下划线只在词边界处表示强调（Python-Markdown 的 smart emphasis），a_b_c 保持原样
+    (re.compile(r'(?<!\w)(_{1,3})(?!_)(.+?)(?<!_)\1(?!\w)'), r'\2'),
+    (re.compile(r'<[^>]+>'), ''),                         # 内联 HTML
+]
+
+
+def close_fence(fence, match):
+    return match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence)
+
+
+def scan_headings(body):
+    """
+    产出代码块之外的 (级别, 原始标题文本, 原始行)，支持 ATX 与 Setext 两种标题
+    """
+    fence = None
+    # 当前块的第一行，Setext 标题只能由块的第一行加下划线构成
+    first_line = None
+    at_block_start = True
+
+    for line in body.splitlines():
+        match = FENCE_RE.match(line)
+        if fence is not None:
+            if close_fence(fence, match):
+                fence = None
+                at_block_start = True
+            continue
+        if match:
+            fence = match.group(1)
+            first_line = None
+            continue
+
+        heading = HEADING_RE.match(line)
+        if heading:
+            yield len(heading.group(1)), heading.group(2).strip(), line.strip()
+            first_line = None
+            at_block_start = True
+            continue
+
+        if first_line is not None and SETEXT_RE.match(line):
+            level = 1 if line.strip()[0] == '=' else 2
+            text = first_line.strip()
+            yield level, text, f"{'#' * level} {text}"
+            first_line = None
+            at_block_start = True
+            continue
+
+        blank = not line.strip()
+        if at_block_start and not blank and not line.startswith('    '):
+            first_line = line
+        else:
+            first_line = None
+        at_block_start = blank
+
+
+def heading_lines(body):
+    """
+    代码块之外的标题行（统一为 ATX 形式）
+    """
+    return [line for _, _, line in scan_headings(body)]
+
+
+def plain_text(text):
+    """
+    去掉标题中的行内 Markdown 标记
+    """
+    for pattern, repl in INLINE_PATTERNS:
+        text = pattern.sub(repl, text)
+    return html.unescape(text).strip()
+
+
+def extract_toc(body):
+    """
+    返回 [{'level': 1, 'text': '标题', 'anchor': 'id'}, ...]
+    """
+    headings = []
+    used_ids = set()
+    for level, text, _ in scan_headings(body):
+        anchor = None
+        attrs = ATTR_LIST_RE.search(text)
+        if attrs:
+            text = text[:attrs.start()]
+            id_match = ATTR_ID_RE.search(attrs.group(1))
+            if id_match:
+                anchor = id_match.group(1)
+                used_ids.add(anchor)
+        headings.append((level, plain_text(text), anchor))
+
+    # 与 toc 扩展一样，先收集显式 id，再为其余标题生成不重复的锚点
+    toc = []
+    for level, text, anchor in headings:
+        if anchor is None:
+            anchor = unique(slugify(text, '-'), used_ids)
+        toc.append({'level': level, 'text': text, 'anchor': anchor})
+    return toc
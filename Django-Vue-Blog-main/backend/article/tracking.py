@@ -0,0 +1,184 @@
+"""
+文章阅读记录的写缓冲
+
+阅读量是访问最频繁的写操作，逐条 INSERT 会让每次打开文章都多一次写库。
+阅读先追加到进程内的缓冲区，满足条数或时间阈值时用 bulk_create 批量写入 ArticleView，
+同时按文章汇总后更新 views_count。
+
+* 缓冲区有上限（MAX_SIZE），写库失败或流量突增时丢弃新的记录，内存占用保持稳定
+* 后台线程按 FLUSH_INTERVAL 定时写入，进程退出时（atexit）写入剩余记录
+* 进程被强制杀死（SIGKILL）时未写入的记录会丢失，阅读量允许这种误差
+
+bulk_create 不会触发 post_save，计数与缓存失效在 flush() 中处理。
+为避免列表缓存频繁失效，只使对应文章详情的缓存失效，列表中的阅读量会有缓存时长内的延迟。
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from article.cache import bump
+from article.counters import increment
+from article.models import Article, ArticleView
+from article.visitors import update_sketches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'FLUSH_SIZE': 500,      # 缓冲达到该条数时立即写入
+    'FLUSH_INTERVAL': 5,    # 后台线程的写入间隔（秒）
+    'MAX_SIZE': 10000,      # 缓冲区上限，超过后丢弃新的记录
+}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'ARTICLE_VIEW_BUFFER', {})}
+
+
+class ViewBuffer:
+    """
+    进程内的阅读记录缓冲区，线程安全
+    """
+
+    def __init__(self, flush_size, flush_interval, max_size):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.dropped = 0
+        self._items = deque()
+        self._lock = threading.Lock()
+        # 同一时间只有一个线程写库
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def __len__(self):
+        return len(self._items)
+
+    def record(self, article_id, visitor=None, viewed_at=None):
+        """
+        追加一条阅读记录，缓冲区已满时丢弃并返回 False
+
+        visitor 为访客标识的哈希（见 article.visitors.visitor_key），用于统计独立访客
+        """
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._items.append((article_id, viewed_at or timezone.now(), visitor))
+            full = len(self._items) >= self.flush_size
+        self._start()
+        if full:
+            self.flush(blocking=False)
+        return True
+
+    def _drain(self):
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+        return items
+
+    def _restore(self, items):
+        """
+        写库失败时放回缓冲区，超出上限的部分丢弃
+        """
+        with self._lock:
+            room = max(self.max_size - len(self._items), 0)
+            self.dropped += max(len(items) - room, 0)
+            self._items.extendleft(reversed(items[:room]))
+
+    def flush(self, blocking=True):
+        """
+        把缓冲区写入数据库，返回写入的条数
+
+        blocking=False 时若其他线程正在写入则直接返回
+        """
+        if not self._flush_lock.acquire(blocking=blocking):
+            return 0
+        try:
+            items = self._drain()
+            if not items:
+                return 0
+            try:
+                return write_views(items)
+            except Exception:
+                logger.exception('Failed to flush %d article views', len(items))
+                self._restore(items)
+                return 0
+        finally:
+            self._flush_lock.release()
+
+    def _start(self):
+        if self._thread is not None or not self.flush_interval:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name='article-view-buffer', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            close_old_connections()
+            self.flush()
+
+    def close(self):
+        """
+        停止后台线程并写入剩余记录
+        """
+        self._stopped.set()
+        self.flush()
+
+
+def write_views(items):
+    """
+    批量写入阅读记录，更新计数和独立访客草图，忽略已删除的文章
+    """
+    totals = Counter(article_id for article_id, _, _ in items)
+    existing = set(
+        Article.objects.filter(pk__in=totals).values_list('pk', flat=True)
+    )
+    views = [
+        ArticleView(article_id=article_id, viewed_at=viewed_at)
+        for article_id, viewed_at, _ in items
+        if article_id in existing
+    ]
+    with transaction.atomic():
+        ArticleView.objects.bulk_create(views, batch_size=1000)
+        for article_id in existing:
+            increment(article_id, 'views_count', totals[article_id])
+        update_sketches([item for item in items if item[0] in existing])
+    if existing:
+        bump(*[f'article:{article_id}' for article_id in existing])
+    return len(views)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = get_settings()
+                _buffer = ViewBuffer(
+                    config['FLUSH_SIZE'], config['FLUSH_INTERVAL'], config['MAX_SIZE']
+                )
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+def record_view(article_id, visitor=None):
+    return get_buffer().record(article_id, visitor)
+
+
+def flush_views():
+    return get_buffer().flush()
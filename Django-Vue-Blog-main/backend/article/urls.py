@@ -11,6 +11,8 @@ urlpatterns = [
     path('article/stats/', views.article_stats, name='article-stats'),
     path('article/<int:pk>/comments/', views.article_comments, name='article-comments'),
     path('article/update_meta/<int:pk>/', views.ArticleMetaUpdateView.as_view(), name='article-meta-update'),
+    path('article/likes/', views.article_likes, name='article-likes'),
     path('article/<int:pk>/like/', views.article_like, name='article-like'),
+    path('article/<int:pk>/view/', views.article_view, name='article-view'),
     path('', include(router.urls)),
 ]
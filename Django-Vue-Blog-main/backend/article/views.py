@@ -6,13 +6,31 @@ from rest_framework.response import Response
 from django_filters import rest_framework as django_filters
 from rest_framework import generics
 from rest_framework import status
-from django.db.models import Count
+from rest_framework.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+import datetime
+import time
 
 from article.permissions import IsAdminUserOrReadOnly
+from article.mixins import SparseFieldsetViewMixin
+from article.conditional import ConditionalGetMixin, compute_etag, conditional_response
+from article.cache import ResponseCacheMixin, cached_response, get_generations, object_scope
+from article.cache import get_settings as get_cache_settings
+from article.pagination import ArticlePagination, ArticleStatsPagination, CommentPagination
+from article.preview import build_preview
+from article.search import search_articles, query_terms, highlight, snippet
+from article.tracking import record_view
+from article.likes import MAX_BATCH_SIZE, like, like_states, unlike
+from article.rollups import INTERVALS, MAX_SERIES_POINTS, series_length, view_series
+from article.stats import parse_ordering, stats_queryset
+from article.visitors import STANDARD_ERROR, daily_unique_visitors, unique_visitors, visitor_key
 from article.models import Article, Category, CoverImage, ArticleLike
 from user_info.models import User
+from comment.tree import build_tree, link_more_replies, root_queryset, with_replies
 from article.serializers import (
     ArticleSerializer,
+    ArticleListSerializer,
     CategorySerializer,
     CoverImageSerializer,
     CategoryDetailSerializer,
@@ -33,13 +51,53 @@ class CoverImageViewSet(viewsets.ModelViewSet):
     """
     文章封面图视图集
     """
-    queryset = CoverImage.objects.all()
+    queryset = CoverImage.objects.prefetch_related('variants')
     serializer_class = CoverImageSerializer
     permission_classes = [IsAdminUserOrReadOnly]
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def date_param(request, name, default=None):
+    """
+    解析日期查询参数 YYYY-MM-DD，缺省时返回 default
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Invalid date, expected YYYY-MM-DD'})
+    return parsed
+
+
+def list_generations(*scopes):
+    """
+    列表类响应的校验值：相关资源的代，加上按响应缓存时长划分的时间段
+
+    阅读量只使文章详情失效，不更新列表的代，列表中的阅读量与响应缓存一样最多延迟一个时长
+    """
+    period = int(time.time() // get_cache_settings()['TIMEOUT'])
+    return (*get_generations(*scopes), period)
+
+
+def article_comments_meta(pk):
+    """
+    文章评论的校验值 (评论数, 评论的代)，文章不存在时返回 None
+
+    评论的增删改都会更新 comments 的代，不需要聚合文章的全部评论
+    """
+    row = Article.objects.filter(pk=pk).values_list('comments_count').first()
+    if row is None:
+        return None
+    return (*row, *get_generations(object_scope('comments', pk)))
+
+
+class CategoryViewSet(ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     分类视图集
+
+    只读接口支持 ETag 条件请求和响应缓存
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -51,16 +109,40 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return CategorySerializer
         else:
             return CategoryDetailSerializer
+
+    def get_cache_scopes(self, pk=None, **kwargs):
+        if self.action == 'list':
+            return ['categories']
+        return ['categories', 'articles']
+
+    def get_conditional_meta(self, request, pk=None, **kwargs):
+        # 分类没有更新时间，只提供 ETag；分类的增删改都会更新 categories 的代
+        if self.action == 'list':
+            return tuple(get_generations('categories')), None
+
+        # 详情和文章列表包含文章的计数，计数通过 F() 更新，不会改变 updated_at
+        if not Category.objects.filter(pk=pk).exists():
+            return None
+        return list_generations('categories', 'articles'), None
         
     @action(detail=True, methods=['get'])
     def articles(self, request, pk=None):
         """获取特定分类下的所有文章"""
-        category = self.get_object()
-        articles = Article.objects.filter(category=category)
-        serializer = ArticleSerializer(articles, many=True)
-        return Response(serializer.data)
+        def handler():
+            category = self.get_object()
+            context = self.get_serializer_context()
+            articles = self.sparse_queryset(
+                Article.objects.filter(category=category)
+                .select_related('author')
+                .prefetch_related('coverimage__variants'),
+                ArticleListSerializer(context=context, sparse_fields=True)
+            )
+            serializer = ArticleListSerializer(articles, many=True, context=context, sparse_fields=True)
+            return Response(serializer.data)
 
-class ArticleViewSet(viewsets.ModelViewSet):
+        return self.conditional(request, handler, pk=pk)
+
+class ArticleViewSet(ResponseCacheMixin, ConditionalGetMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     文章的增删改查接口
     
@@ -68,6 +150,9 @@ class ArticleViewSet(viewsets.ModelViewSet):
     获取文章列表
     * 支持按分类过滤
     * 支持标题搜索
+    * 按 (created_at, id) 倒序游标分页，?cursor= 翻页
+    * 不包含正文，支持 ?fields= / ?exclude= 指定返回字段
+    * cover_variants 为封面图缩放版本（WebP / JPEG）的地址
     
     create:
     创建新文章
@@ -77,16 +162,29 @@ class ArticleViewSet(viewsets.ModelViewSet):
     retrieve:
     获取文章详情
     * 包含完整的文章内容和评论
+
+    list 与 retrieve 支持 ETag / Last-Modified 条件请求，未修改时返回 304；
+    匿名请求的响应会被缓存，文章、分类、评论、点赞变化时失效
+
+    search:
+    全文检索
+    * ?q= 检索标题、摘要和正文，支持中文
+    * 按相关度排序，返回高亮的标题和摘要片段
+
+    preview:
+    编辑器实时预览
+    * 只返回本次编辑会话中变化的段落和最新目录
     """
     queryset = Article.objects.all()
     serializer_class = ArticleSerializer
+    pagination_class = ArticlePagination
     
     def get_permissions(self):
         """
         获取文章列表和详情允许匿名访问
         创建、编辑和删除需要管理员权限
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'search']:
             permission_classes = []  # 允许匿名访问
         else:
             permission_classes = [IsAuthenticated]  # 需要登录
@@ -101,12 +199,35 @@ class ArticleViewSet(viewsets.ModelViewSet):
         支持通过 category 参数过滤文章
         ?category=1 获取分类ID为1的文章
         """
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('author')
+        if self.action == 'list':
+            queryset = queryset.prefetch_related('coverimage__variants')
         category = self.request.query_params.get('category', None)
         if category:
             queryset = queryset.filter(category_id=category)
         return queryset
 
+    def get_cache_scopes(self, pk=None, **kwargs):
+        if self.action == 'list':
+            return ['articles', 'categories']
+        scope = object_scope('article', pk)
+        return ['categories', scope] if scope else None
+
+    def get_conditional_meta(self, request, pk=None, **kwargs):
+        if self.action == 'list':
+            # 列表的校验值取自响应缓存的代，不查询文章表：文章、分类、评论、点赞、
+            # 计数合并和封面图版本的变化都会更新代
+            return list_generations('articles', 'categories'), None
+
+        scope = object_scope('comments', pk)
+        row = Article.objects.filter(pk=pk).values_list(
+            'updated_at', 'likes_count', 'views_count', 'comments_count'
+        ).first() if scope else None
+        if row is None:
+            return None
+        # 计数变化和评论删除不会改变任何更新时间，只提供 ETag；内嵌评论的修改更新 comments 的代
+        return row + tuple(get_generations(scope)), None
+
     def perform_create(self, serializer):
         # 确保处理category_id
         category_id = self.request.data.get('category_id')
@@ -138,20 +259,112 @@ class ArticleViewSet(viewsets.ModelViewSet):
             
     def get_serializer_class(self):
         if self.action == 'list':
-            return ArticleSerializer
+            return ArticleListSerializer
         else:
             return ArticleDetailSerializer
 
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        """
+        参数: q 检索词，offset / limit 分页
+        """
+        query = request.query_params.get('q', '').strip()
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response(
+                {'error': 'offset and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        count, hits = search_articles(query, offset=offset, limit=limit)
+        articles = Article.objects.select_related('author').prefetch_related('coverimage__variants').in_bulk(
+            [article_id for article_id, _ in hits]
+        )
+        terms = query_terms(query)
+        context = self.get_serializer_context()
+
+        results = []
+        for article_id, score in hits:
+            article = articles.get(article_id)
+            if article is None:
+                continue
+            data = ArticleListSerializer(article, context=context, sparse_fields=True).data
+            data['score'] = score
+            data['title_html'] = highlight(article.title, terms)
+            data['snippet'] = snippet(article.body, terms)
+            results.append(data)
+
+        return Response({'count': count, 'results': results})
+
+    @action(detail=False, methods=['POST'])
+    def preview(self, request):
+        """
+        请求体: {"body": "...", "session": "上次返回的 session，可选"}
+        """
+        body = request.data.get('body')
+        if not isinstance(body, str):
+            return Response(
+                {'error': 'body is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(build_preview(body, request.data.get('session')))
+
+    @action(detail=True, methods=['GET'], url_path='views')
+    def view_stats(self, request, pk=None):
+        """
+        阅读量时间序列（管理员）
+        参数: start / end 日期 YYYY-MM-DD（含），默认最近 30 天；interval 为 day 或 hour
+        """
+        if not request.user.is_superuser:
+            return Response({'error': '只有管理员可以访问此功能'}, status=403)
+        article = self.get_object()
+
+        interval = request.query_params.get('interval', 'day')
+        end = date_param(request, 'end', timezone.localdate())
+        start = date_param(request, 'start', end - datetime.timedelta(days=29))
+        if interval not in INTERVALS or start > end:
+            return Response(
+                {'error': 'invalid range or interval'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if series_length(start, end, interval) > MAX_SERIES_POINTS:
+            return Response(
+                {'error': f'range too large, at most {MAX_SERIES_POINTS} buckets'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        series = view_series(article.pk, start, end, interval)
+        points = [{'bucket': bucket.isoformat(), 'views': views} for bucket, views in series]
+        if interval == 'day':
+            daily = daily_unique_visitors(article.pk, start, end)
+            for point, (day, _) in zip(points, series):
+                point['unique_visitors'] = daily.get(day, 0)
+        return Response({
+            'interval': interval,
+            'start': start,
+            'end': end,
+            'total': sum(views for _, views in series),
+            'unique_visitors': unique_visitors([article.pk], start, end)[article.pk],
+            'unique_visitors_error': STANDARD_ERROR,
+            'series': points,
+        })
+
     @action(detail=True, methods=['GET'])
     def comments(self, request, pk=None):
         article = self.get_object()
-        comments = article.comments.all()
+        paginator = CommentPagination()
+        roots = paginator.paginate_queryset(root_queryset(article.pk), request)
+        comments, more = with_replies(roots)
         serializer = CommentSerializer(
             comments, 
             many=True,
-            context={'request': request}
+            context={'request': request},
+            sparse_fields=True
         )
-        return Response(serializer.data)
+        nodes = build_tree(comments, serializer.data)
+        return paginator.get_paginated_response(link_more_replies(nodes, roots, more, request))
 
 class ArticleMetaUpdateView(generics.UpdateAPIView):
     queryset = Article.objects.all()
@@ -183,41 +396,83 @@ class ArticleMetaUpdateView(generics.UpdateAPIView):
 # 管理员才能访问统计信息
 @permission_classes([IsAuthenticated])
 def article_stats(request):
+    """
+    文章统计（管理员）
+    参数: start / end 日期 YYYY-MM-DD（含），只统计该范围内的点赞、阅读、评论；
+    ordering 为 created_at / likes_count / views_count / comments_count，前缀 - 表示倒序；
+    cursor / page_size 分页
+    """
     # 检查是否是管理员
     if not request.user.is_superuser:
         return Response({'error': '只有管理员可以访问此功能'}, status=403)
-            
-    try:
-        articles = Article.objects.annotate(
-            likes_count=Count('articlelike'),
-            views_count=Count('articleview'),
-            comments_count=Count('comments')
-        ).values(
-            'id', 
-            'title', 
-            'created_at',
-            'likes_count',
-            'views_count',
-            'comments_count'
-        ).order_by('-created_at')
-                
-        return Response(list(articles))
-    except Exception as e:
+
+    start = date_param(request, 'start')
+    end = date_param(request, 'end')
+    ordering = parse_ordering(request.query_params.get('ordering', '-created_at'))
+    if ordering is None or (start and end and start > end):
         return Response(
-            {'error': f'获取文章统计失败: {str(e)}'}, 
-            status=500
+            {'error': 'invalid range or ordering'},
+            status=status.HTTP_400_BAD_REQUEST
         )
 
+    paginator = ArticleStatsPagination(ordering)
+    page = paginator.paginate_queryset(stats_queryset(start, end), request)
+    visitors = unique_visitors([article.pk for article in page], start, end)
+    for article in page:
+        article.unique_visitors = visitors[article.pk]
+    serializer = ArticleStatsSerializer(page, many=True)
+    response = paginator.get_paginated_response(serializer.data)
+    # 独立访客数为 HyperLogLog 估计值，相对标准误差
+    response.data['unique_visitors_error'] = STANDARD_ERROR
+    return response
+
 @api_view(['GET'])
 # 允许匿名查看评论
 def article_comments(request, pk):
+    def handler():
+        meta = article_comments_meta(pk)
+        if meta is None:
+            return Response({'error': '文章不存在'}, status=404)
+
+        def render_comments():
+            paginator = CommentPagination()
+            roots = paginator.paginate_queryset(root_queryset(pk), request)
+            comments, more = with_replies(roots)
+            serializer = CommentSerializer(comments, many=True)
+            nodes = build_tree(comments, serializer.data)
+            return paginator.get_paginated_response(link_more_replies(nodes, roots, more, request))
+
+        return conditional_response(
+            request,
+            render_comments,
+            etag=compute_etag(request, *meta)
+        )
+
+    return cached_response(request, [object_scope('comments', pk)], handler)
+
+@api_view(['POST'])
+# 记录一次阅读，允许匿名；先写入缓冲区，稍后批量入库
+def article_view(request, pk):
+    # 缓冲区已满时丢弃，不让客户端重试加重负载
+    recorded = record_view(pk, visitor_key(request))
+    return Response(
+        {'status': 'recorded' if recorded else 'dropped'},
+        status=status.HTTP_202_ACCEPTED
+    )
+
+@api_view(['GET'])
+# 批量获取点赞数和当前用户的点赞状态，?ids=1,2,3
+def article_likes(request):
     try:
-        article = Article.objects.get(pk=pk)
-        comments = article.comments.all().order_by('-created_at')
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
-    except Article.DoesNotExist:
-        return Response({'error': '文章不存在'}, status=404)
+        ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value]
+    except ValueError:
+        return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > MAX_BATCH_SIZE:
+        return Response(
+            {'error': f'at most {MAX_BATCH_SIZE} ids'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(like_states(ids, request.user))
 
 @api_view(['GET', 'POST', 'DELETE'])
 def article_like(request, pk):
@@ -226,7 +481,7 @@ def article_like(request, pk):
                
         if request.method == 'GET':
             # 获取点赞数量不需要登录
-            like_count = ArticleLike.objects.filter(article=article).count()
+            like_count = article.likes_count
                        
             # 检查用户是否已点赞（需要登录）
             is_liked = False
@@ -245,20 +500,24 @@ def article_like(request, pk):
             return Response({'error': '请先登录'}, status=401)
                    
         elif request.method == 'POST':
-            # 添加点赞
-            ArticleLike.objects.get_or_create(
-                article=article,
-                user=request.user
-            )
-            return Response({'status': 'liked'})
+            # 添加点赞，重复点赞不会产生多条记录
+            like(article, request.user)
+            article.refresh_from_db(fields=['likes_count'])
+            return Response({
+                'status': 'liked',
+                'is_liked': True,
+                'like_count': article.likes_count
+            })
                    
         elif request.method == 'DELETE':
-            # 取消点赞
-            ArticleLike.objects.filter(
-                article=article,
-                user=request.user
-            ).delete()
-            return Response({'status': 'unliked'})
+            # 取消点赞，未点赞时同样返回成功
+            unlike(article, request.user)
+            article.refresh_from_db(fields=['likes_count'])
+            return Response({
+                'status': 'unliked',
+                'is_liked': False,
+                'like_count': article.likes_count
+            })
                
     except Article.DoesNotExist:
         return Response({'error': '文章不存在'}, status=404)
\ No newline at end of file
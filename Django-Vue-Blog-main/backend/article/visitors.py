@@ -0,0 +1,127 @@
+"""
+文章的独立访客数（近似）
+
+不保存访客身份，只把访客标识的哈希写入 HyperLogLog 草图（见 article.hll）：
+* ArticleVisitorSketch：文章的全部访客
+* ArticleViewDaily.visitors：文章每天的访客，合并后得到任意日期范围的访客数
+
+草图在阅读记录批量写入时更新（见 article.tracking），估计值的相对标准误差约为 STANDARD_ERROR。
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from article.hll import STANDARD_ERROR, HyperLogLog, hash_value
+from article.models import ArticleViewDaily, ArticleVisitorSketch
+from article.rollups import day_bucket
+
+
+def visitor_key(request):
+    """
+    访客标识的哈希：登录用户用 id，匿名用户用 IP 与 User-Agent
+    """
+    if request.user.is_authenticated:
+        identity = f'user:{request.user.pk}'
+    else:
+        identity = 'anon:{}|{}'.format(
+            request.META.get('REMOTE_ADDR', ''),
+            request.META.get('HTTP_USER_AGENT', ''),
+        )
+    return hash_value(identity)
+
+
+def _update(model, filters, key_of, hashes, field, create):
+    """
+    合并 {键: {哈希}} 到已有草图，不存在的行用 create(键, 草图) 创建
+    """
+    rows = {key_of(row): row for row in model.objects.select_for_update().filter(**filters)}
+    updated = []
+    created = []
+    for key, values in hashes.items():
+        row = rows.get(key)
+        sketch = HyperLogLog.load(getattr(row, field) if row else None)
+        for value in values:
+            sketch.add_hash(value)
+        if row is None:
+            created.append(create(key, sketch.dump()))
+        else:
+            setattr(row, field, sketch.dump())
+            updated.append(row)
+    model.objects.bulk_update(updated, [field], batch_size=500)
+    model.objects.bulk_create(created, batch_size=500)
+
+
+def update_sketches(items):
+    """
+    把 [(article_id, viewed_at, 访客哈希), ...] 写入文章和每天的草图，没有访客哈希的记录跳过
+    """
+    by_article = defaultdict(set)
+    by_day = defaultdict(set)
+    for article_id, viewed_at, visitor in items:
+        if visitor is None:
+            continue
+        by_article[article_id].add(visitor)
+        by_day[(article_id, day_bucket(viewed_at))].add(visitor)
+    if not by_article:
+        return
+
+    with transaction.atomic():
+        _update(
+            ArticleVisitorSketch,
+            {'article_id__in': by_article},
+            lambda row: row.article_id,
+            by_article,
+            'sketch',
+            lambda article_id, data: ArticleVisitorSketch(article_id=article_id, sketch=data),
+        )
+        _update(
+            ArticleViewDaily,
+            {
+                'article_id__in': by_article,
+                'day__in': {day for _, day in by_day},
+            },
+            lambda row: (row.article_id, row.day),
+            by_day,
+            'visitors',
+            # 阅读量由 rollup_article_views 汇总
+            lambda key, data: ArticleViewDaily(article_id=key[0], day=key[1], views=0, visitors=data),
+        )
+
+
+def unique_visitors(article_ids, start=None, end=None):
+    """
+    返回 {article_id: 独立访客估计值}；指定日期范围时合并每天的草图
+    """
+    if start is None and end is None:
+        rows = ArticleVisitorSketch.objects.filter(article_id__in=article_ids).values_list(
+            'article_id', 'sketch'
+        )
+        totals = {article_id: HyperLogLog.load(data).estimate() for article_id, data in rows}
+        return {article_id: totals.get(article_id, 0) for article_id in article_ids}
+
+    days = ArticleViewDaily.objects.filter(article_id__in=article_ids).exclude(visitors=b'')
+    if start is not None:
+        days = days.filter(day__gte=start)
+    if end is not None:
+        days = days.filter(day__lte=end)
+    sketches = {}
+    for article_id, data in days.values_list('article_id', 'visitors').iterator():
+        sketch = HyperLogLog.load(data)
+        if article_id in sketches:
+            sketches[article_id].merge(sketch)
+        else:
+            sketches[article_id] = sketch
+    return {
+        article_id: sketches[article_id].estimate() if article_id in sketches else 0
+        for article_id in article_ids
+    }
+
+
+def daily_unique_visitors(article_id, start, end):
+    """
+    返回 {日期: 独立访客估计值}
+    """
+    rows = ArticleViewDaily.objects.filter(
+        article_id=article_id, day__gte=start, day__lte=end
+    ).exclude(visitors=b'').values_list('day', 'visitors')
+    return {day: HyperLogLog.load(data).estimate() for day, data in rows}
@@ -146,7 +146,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication 的子类，缓存令牌对应的用户
+        'user_info.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # 默认允许所有人访问
@@ -159,9 +160,66 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),    # 刷新 Token 有效期
 }
 
+# JWT 认证时缓存用户（不含密码哈希）的秒数。用户保存或删除时删除缓存条目，
+# 但本地内存缓存每个进程一份，其他进程最多在这段时间内仍使用旧数据（如已停用的用户）；
+# 需要立即失效时将 CACHES 配置为共享缓存
+USER_CACHE_TIMEOUT = 10
+
+# 用户主页展示的最新文章数
+USER_PROFILE_ARTICLES = 5
+
+# 登录、获取令牌与注册的令牌桶限流（见 user_info.throttling）
+# 按 IP 限流使用 REMOTE_ADDR；部署在反向代理之后时在 REST_FRAMEWORK 中设置 NUM_PROXIES
+# STORE: local 为进程内计数，django 为 Django 缓存（多进程共享）；速率为 None 表示不限制
+AUTH_THROTTLE = {
+    'STORE': 'local',
+    'RATES': {
+        'login_ip': '20/min',        # 每个 IP 的登录次数
+        'login_username': '5/min',   # 每个用户名的登录次数
+        'register_ip': '10/hour',    # 每个 IP 的注册次数
+    },
+}
+
+# 单篇文章 Markdown 渲染的时间预算（秒），None 表示不限制
+MARKDOWN_RENDER_TIMEOUT = 5
+# 保存文章时渲染所用进程池的进程数，每个 Web 进程各有一个进程池，None 表示使用 CPU 核数
+MARKDOWN_RENDER_WORKERS = 2
+
+# 只读接口的响应缓存，BACKEND 可选 local（进程内 LRU）或 django（Django 缓存）
+# 失效依赖保存在 Django 默认缓存中的“代”，多进程部署时应将 CACHES 配置为共享缓存
+RESPONSE_CACHE = {
+    'BACKEND': 'local',
+    'MAX_ENTRIES': 1000,
+    'TIMEOUT': 60 * 10,
+}
+
+# 文章计数的分片数，0 表示直接更新 Article 上的计数
+# 大于 0 时增量写入分片行，需定期执行 reconcile_article_counters --fold 合并
+ARTICLE_COUNTER_SHARDS = 0
+
+# 文章详情中内嵌的顶层评论数，其余通过评论列表接口分页获取
+ARTICLE_DETAIL_COMMENTS = 10
+
+# 评论列表中每条顶层评论附带的回复数，其余回复通过 replies_next（/api/comment/<id>/replies/）分页获取
+COMMENT_ROOT_REPLIES = 20
+
+# 阅读记录的写缓冲：达到 FLUSH_SIZE 条或每隔 FLUSH_INTERVAL 秒批量写入，缓冲区最多 MAX_SIZE 条
+ARTICLE_VIEW_BUFFER = {
+    'FLUSH_SIZE': 500,
+    'FLUSH_INTERVAL': 5,
+    'MAX_SIZE': 10000,
+}
+
 MEDIA_URL =  '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 封面图缩放版本（见 article.images）：版本名与最大宽度、输出格式与压缩质量、生成线程数
+COVER_IMAGE_VARIANTS = {
+    'WIDTHS': {'thumb': 320, 'small': 640, 'large': 1280},
+    'FORMATS': {'webp': 80, 'jpeg': 82},
+    'WORKERS': 2,
+}
+
 # 添加以下内容来使用 PyMySQL
 pymysql.install_as_MySQLdb()
 
@@ -4,11 +4,8 @@ from django.urls import path, include, re_path
 from rest_framework.routers import DefaultRouter
 from article import views
 from comment.views import CommentViewSet
-from user_info.views import UserViewSet, LoginView, AuthInfoViewSet
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from user_info.views import UserViewSet, LoginView, AuthInfoViewSet, ThrottledTokenObtainPairView
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.contrib import admin
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
@@ -38,7 +35,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
-    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/', ThrottledTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/login/', LoginView.as_view(), name='login'),
     
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0010_stats_time_indexes'),
+        ('comment', '0003_comment_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'created_at'], name='comment_article_time_idx'),
+        ),
+    ]
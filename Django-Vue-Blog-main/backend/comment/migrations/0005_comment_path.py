@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+PATH_STEP = 8
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(pk):
+    digits = []
+    while pk:
+        pk, remainder = divmod(pk, 36)
+        digits.append(DIGITS[remainder])
+    return ''.join(reversed(digits)).rjust(PATH_STEP, '0')
+
+
+def fill_paths(apps, schema_editor):
+    Comment = apps.get_model('comment', 'Comment')
+    parents = dict(Comment.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def build(pk):
+        # 自下而上找到已知路径的祖先，再依次向下拼接，避免递归过深
+        chain = []
+        while pk is not None and pk not in paths:
+            chain.append(pk)
+            pk = parents.get(pk)
+        prefix = paths.get(pk, '')
+        for node in reversed(chain):
+            prefix += path_segment(node)
+            paths[node] = prefix
+
+    for pk in parents:
+        build(pk)
+    for pk, path in paths.items():
+        Comment.objects.filter(pk=pk).update(path=path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0012_unique_article_like'),
+        ('comment', '0004_comment_article_time_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'path'], name='comment_article_path_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,62 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 from article.models import Article
 from user_info.models import User
 
 
+# 物化路径中每一级的长度：评论 id 的定长 36 进制
+PATH_STEP = 8
+PATH_MAX_LENGTH = 255
+MAX_DEPTH = PATH_MAX_LENGTH // PATH_STEP
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def path_segment(pk):
+    digits = []
+    while pk:
+        pk, remainder = divmod(pk, 36)
+        digits.append(_DIGITS[remainder])
+    return ''.join(reversed(digits)).rjust(PATH_STEP, '0')
+
+
 class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comment_comments')
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='children')
+    # 物化路径：祖先到自身的 path_segment 依次拼接，按前缀即可取出整个子树，见 comment.tree
+    path = models.CharField(max_length=PATH_MAX_LENGTH, blank=True, default='', editable=False)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['article', 'path'], name='comment_article_path_idx'),
+            # 文章统计按时间范围计数
+            models.Index(fields=['article', 'created_at'], name='comment_article_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} on {self.article.title}"
+
+    @property
+    def depth(self):
+        return len(self.path) // PATH_STEP
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            if kwargs.get('update_fields') is None:
+                # 路径只在插入和祖先删除时由数据库更新，编辑评论时不写回
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != 'path'
+                ]
+            return super().save(*args, **kwargs)
+        # 路径包含自身 id，插入后再写入
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.path = (self.parent.path if self.parent_id else '') + path_segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
     
\ No newline at end of file
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
-from comment.models import Comment
+from article.mixins import SparseFieldsetSerializerMixin
+from comment.models import MAX_DEPTH, Comment
 from user_info.serializers import UserDescSerializer
 
 
@@ -16,11 +17,17 @@ class CommentChildrenSerializer(serializers.ModelSerializer):
         exclude = ['parent', 'article']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """
     评论序列化器
     """
     user = UserDescSerializer(read_only=True)
+    parent_id = serializers.PrimaryKeyRelatedField(
+        source='parent',
+        queryset=Comment.objects.all(),
+        required=False,
+        allow_null=True
+    )
     
     class Meta:
         model = Comment
@@ -37,4 +44,16 @@ class CommentSerializer(serializers.ModelSerializer):
             'article': {'required': True}
         }
 
-
+    def validate(self, attrs):
+        parent = attrs.get('parent')
+        if self.instance is not None:
+            # 回复关系决定物化路径，创建后不能修改
+            if 'parent' in attrs and parent != self.instance.parent:
+                raise serializers.ValidationError({'parent_id': '不能修改回复的评论'})
+            return attrs
+        if parent is not None:
+            if parent.article_id != attrs['article'].id:
+                raise serializers.ValidationError({'parent_id': '回复的评论不属于该文章'})
+            if parent.depth >= MAX_DEPTH:
+                raise serializers.ValidationError({'parent_id': '回复层级过深'})
+        return attrs
@@ -1,3 +1,158 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from article.testcases import BlogTestCase
+from comment.models import MAX_DEPTH, PATH_STEP, Comment, path_segment
+from comment.serializers import CommentSerializer
+
+
+class CommentQueryCountTestCase(BlogTestCase):
+    """
+    评论列表的查询次数不随评论数量增长
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+
+    def test_comment_list(self):
+        self.create_comments(self.article, 2)
+        self.assertConstantQueries(
+            '/api/comment/',
+            lambda: self.create_comments(self.article, 10)
+        )
+
+
+@override_settings(COMMENT_ROOT_REPLIES=2)
+class ReplyLimitTestCase(BlogTestCase):
+    """
+    评论列表中每条顶层评论只附带有限的回复，其余通过 replies_next 分页获取
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        self.root, self.other = self.create_comments(self.article, 2)
+
+    def reply(self, parent, count):
+        return self.create_comments(self.article, count, parent=parent)
+
+    def collect_ids(self, nodes):
+        ids = []
+        for node in nodes:
+            ids.append(node['id'])
+            ids.extend(self.collect_ids(node['children']))
+        return ids
+
+    def test_replies_capped(self):
+        first = self.reply(self.root, 1)[0]
+        nested = self.reply(first, 2)
+        rest = self.reply(self.root, 2)
+        self.reply(self.other, 1)
+
+        results = self.client.get(f'/api/article/{self.article.id}/comments/').json()['results']
+        nodes = {node['id']: node for node in results}
+        root = nodes[self.root.id]
+        self.assertEqual(self.collect_ids([root]), [self.root.id, first.id, nested[0].id])
+        self.assertIsNotNone(root['replies_next'])
+        self.assertEqual(len(nodes[self.other.id]['children']), 1)
+        self.assertIsNone(nodes[self.other.id]['replies_next'])
+
+        response = self.client.get(root['replies_next']).json()
+        self.assertEqual(
+            self.collect_ids(response['results']),
+            [nested[1].id] + [reply.id for reply in rest]
+        )
+        self.assertIsNone(response['next'])
+
+    def test_replies_endpoint_pages(self):
+        replies = self.reply(self.root, 25)
+        response = self.client.get(f'/api/comment/{self.root.id}/replies/').json()
+        self.assertEqual(len(response['results']), 20)
+        response = self.client.get(response['next']).json()
+        self.assertEqual(
+            [node['id'] for node in response['results']],
+            [reply.id for reply in replies[20:]]
+        )
+
+    def test_constant_queries(self):
+        self.reply(self.root, 3)
+        self.assertConstantQueries(
+            f'/api/article/{self.article.id}/comments/',
+            lambda: self.reply(self.root, 20)
+        )
+
+
+class CommentPathTestCase(BlogTestCase):
+    """
+    物化路径随回复和删除维护，子树用一次查询取出
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.article = self.create_article()
+        [self.root] = self.create_comments(self.article, 1)
+        [self.child] = self.create_comments(self.article, 1, parent=self.root)
+        [self.grandchild] = self.create_comments(self.article, 1, parent=self.child)
+
+    def path(self, comment):
+        return Comment.objects.get(pk=comment.pk).path
+
+    def test_paths(self):
+        self.assertEqual(path_segment(1), '00000001')
+        self.assertEqual(path_segment(36), '00000010')
+        self.assertEqual(
+            self.path(self.grandchild),
+            ''.join(path_segment(c.pk) for c in (self.root, self.child, self.grandchild))
+        )
+        self.assertEqual(self.grandchild.depth, 3)
+
+    def test_edit_keeps_path(self):
+        stale = Comment.objects.get(pk=self.child.pk)
+        Comment.objects.filter(pk=self.child.pk).update(path='stale')
+        stale.content = 'edited'
+        stale.save()
+        self.assertEqual(self.path(self.child), 'stale')
+
+    def test_delete_detaches(self):
+        self.child.delete()
+        grandchild = Comment.objects.get(pk=self.grandchild.pk)
+        self.assertIsNone(grandchild.parent_id)
+        self.assertEqual(grandchild.path, path_segment(grandchild.pk))
+
+    def test_delete_ancestors_together(self):
+        Comment.objects.filter(pk__in=[self.root.pk, self.child.pk]).delete()
+        self.assertEqual(self.path(self.grandchild), path_segment(self.grandchild.pk))
+
+    def test_thread(self):
+        self.create_comments(self.article, 1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/comment/{self.root.pk}/thread/')
+        self.assertEqual(len(context.captured_queries), 2)
+        node = response.json()
+        self.assertEqual(node['id'], self.root.pk)
+        [child] = node['children']
+        self.assertEqual(child['id'], self.child.pk)
+        self.assertEqual([item['id'] for item in child['children']], [self.grandchild.pk])
+
+    def test_reply_validation(self):
+        other = self.create_article(title='other')
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post('/api/comment/', {
+            'content': 'reply', 'article': other.pk, 'parent_id': self.root.pk,
+        })
+        self.assertEqual(response.status_code, 400)
+
+        Comment.objects.filter(pk=self.grandchild.pk).update(path='0' * PATH_STEP * MAX_DEPTH)
+        response = self.client.post('/api/comment/', {
+            'content': 'reply', 'article': self.article.pk, 'parent_id': self.grandchild.pk,
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_parent_is_fixed(self):
+        serializer = CommentSerializer(self.root, data={'parent_id': self.child.pk}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('parent_id', serializer.errors)
+        serializer = CommentSerializer(self.root, data={'content': 'edited'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
@@ -0,0 +1,198 @@
+"""
+评论树
+
+评论的 path 为祖先到自身 id 的定长编码拼接（见 comment.models.path_segment），
+一篇文章的全部评论或某条评论的整个子树都可以用 (article, path) 索引上的范围查询取出，
+再在内存中按 parent_id 组装为嵌套结构，不再逐层查询子评论。
+
+* 列表按顶层评论分页（见 article.pagination.CommentPagination），
+  每条顶层评论最多附带 settings.COMMENT_ROOT_REPLIES 条回复，其余由 replies_next 分页获取
+* 回复按时间正序（路径顺序）
+"""
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber, Substr
+from django.urls import reverse
+
+from article.pagination import CommentPagination, ReplyPagination
+from comment.models import PATH_STEP, Comment, path_segment
+
+
+def thread_queryset(article_id, root=None):
+    """
+    文章的全部评论，或以 root 为根的子树（包含 root），按路径排序
+    """
+    queryset = Comment.objects.filter(article_id=article_id).select_related('user')
+    if root is not None:
+        queryset = queryset.filter(path__startswith=root.path)
+    return queryset.order_by('path')
+
+
+def root_queryset(article_id):
+    """
+    文章的顶层评论，包括父评论已删除的回复
+    """
+    return Comment.objects.filter(article_id=article_id, parent__isnull=True).select_related('user')
+
+
+def embed_limit():
+    """
+    文章详情中内嵌的顶层评论数
+    """
+    return getattr(settings, 'ARTICLE_DETAIL_COMMENTS', 10)
+
+
+def embedded_comments(article):
+    """
+    返回 (内嵌的顶层评论, 是否还有更多)
+
+    多取一条判断是否还有更多。每篇文章单独查询一次，只用于文章详情；
+    切片的 Prefetch 需要 Django 4.2 以上，这里不使用
+    """
+    comments = getattr(article, 'embedded_comments', None)
+    if comments is None:
+        comments = list(
+            root_queryset(article.pk).order_by(*CommentPagination.ordering)[:embed_limit() + 1]
+        )
+        article.embedded_comments = comments
+    limit = embed_limit()
+    return comments[:limit], len(comments) > limit
+
+
+def reply_limit():
+    """
+    评论列表中每条顶层评论附带的回复数
+    """
+    return getattr(settings, 'COMMENT_ROOT_REPLIES', 20)
+
+
+def limited_replies(roots, limit):
+    """
+    每条顶层评论按路径排序的前 limit 条回复的 id，作为子查询
+
+    顶层评论的 path 只有自身一段，回复按 path 的第一段分组编号，
+    窗口函数不能直接用于过滤（Django 4.2 以前），因此在外层查询中按编号过滤
+    """
+    condition = Q()
+    for root in roots:
+        condition |= Q(path__startswith=root.path)
+    ranked = (
+        Comment.objects
+        .filter(condition, article_id=roots[0].article_id)
+        .exclude(pk__in=[root.pk for root in roots])
+        .annotate(reply_position=Window(
+            RowNumber(),
+            partition_by=Substr('path', 1, PATH_STEP),
+            order_by=F('path').asc(),
+        ))
+        .order_by()
+        .values('id', 'reply_position')
+    )
+    sql, params = ranked.query.sql_with_params()
+    quote = connection.ops.quote_name
+    return RawSQL(
+        f'SELECT ranked.{quote("id")} FROM ({sql}) ranked '
+        f'WHERE ranked.{quote("reply_position")} <= %s',
+        (*params, limit),
+    )
+
+
+def with_replies(roots, limit=None):
+    """
+    顶层评论（保持给定顺序）加上每条顶层评论按路径排序的前 limit 条回复，回复用一次查询取出
+
+    返回 (评论列表, {还有更多回复的顶层评论 id: 返回的最后一条回复})。
+    按路径排序时父评论总在回复之前，截断后的回复仍能组装为完整的树。
+    """
+    roots = list(roots)
+    if not roots:
+        return [], {}
+    if limit is None:
+        limit = reply_limit()
+    # 多取一条判断是否还有更多
+    replies = (
+        Comment.objects
+        .filter(pk__in=limited_replies(roots, limit + 1))
+        .select_related('user')
+        .order_by('path')
+    )
+    by_segment = {root.path[:PATH_STEP]: root for root in roots}
+    counts = {}
+    last = {root.pk: root for root in roots}
+    kept = []
+    more = {}
+    for reply in replies:
+        root = by_segment[reply.path[:PATH_STEP]]
+        counts[root.pk] = counts.get(root.pk, 0) + 1
+        if counts[root.pk] > limit:
+            more[root.pk] = last[root.pk]
+            continue
+        last[root.pk] = reply
+        kept.append(reply)
+    return roots + kept, more
+
+
+def replies_url(root, after, request=None):
+    """
+    root 的回复中 after 之后的一页
+    """
+    url = '{}?{}'.format(
+        reverse('comment-replies', kwargs={'pk': root.pk}),
+        urlencode({'cursor': ReplyPagination().cursor_after(after)}),
+    )
+    return request.build_absolute_uri(url) if request else url
+
+
+def link_more_replies(nodes, roots, more, request=None):
+    """
+    为顶层节点加上 replies_next（其余回复的地址，没有更多时为 None）
+
+    nodes 为 build_tree 的结果，与 roots 一一对应
+    """
+    for root, node in zip(roots, nodes):
+        after = more.get(root.pk)
+        node['replies_next'] = replies_url(root, after, request) if after else None
+    return nodes
+
+
+def build_tree(comments, data):
+    """
+    comments 中父评论须排在回复之前，data 为对应的序列化结果，返回顶层节点列表
+
+    父评论不在结果中的评论作为顶层节点，顶层节点保持 comments 中的顺序
+    """
+    nodes = {}
+    roots = []
+    for comment, item in zip(comments, data):
+        node = {**item, 'children': []}
+        nodes[comment.pk] = node
+        parent = nodes.get(comment.parent_id)
+        if parent is None:
+            roots.append(node)
+        else:
+            parent['children'].append(node)
+    return roots
+
+
+def detach_descendants(comment):
+    """
+    评论删除后，回复的 parent 被置空成为顶层评论，去掉子树路径中已删除评论及其之前的部分
+
+    按路径中对齐的编码查找而不是按前缀，同一次删除多条祖孙评论时结果与删除顺序无关
+    """
+    segment = path_segment(comment.pk)
+    descendants = Comment.objects.filter(
+        article_id=comment.article_id, path__contains=segment
+    ).exclude(pk=comment.pk).only('pk', 'path')
+    updated = []
+    for descendant in descendants:
+        for start in range(0, len(descendant.path), PATH_STEP):
+            if descendant.path[start:start + PATH_STEP] == segment:
+                descendant.path = descendant.path[start + PATH_STEP:]
+                updated.append(descendant)
+                break
+    Comment.objects.bulk_update(updated, ['path'], batch_size=500)
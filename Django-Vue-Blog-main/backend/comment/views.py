@@ -1,15 +1,20 @@
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
+from article.mixins import SparseFieldsetViewMixin
+from article.pagination import ReplyPagination
 from comment.models import Comment
 from comment.serializers import CommentSerializer
 from comment.permissions import IsOwnerOrReadOnly
+from comment.tree import build_tree, thread_queryset
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     评论视图集
     """
-    queryset = Comment.objects.all()
+    queryset = Comment.objects.select_related('user')
     serializer_class = CommentSerializer
     
     def get_permissions(self):
@@ -17,11 +22,42 @@ class CommentViewSet(viewsets.ModelViewSet):
         查看评论允许匿名访问
         创建、编辑和删除评论需要登录
         """
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'thread', 'replies']:
             permission_classes = []  # 允许匿名访问
         else:
             permission_classes = [IsOwnerOrReadOnly]  # 需要登录且只有评论作者可以编辑
         return [permission() for permission in permission_classes]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['thread', 'replies']:
+            # 取子树要用根评论的 path，不按返回字段裁剪
+            queryset = queryset.defer(None)
+        return queryset
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @action(detail=True, methods=['GET'])
+    def thread(self, request, pk=None):
+        """
+        以该评论为根的整个回复树
+        """
+        comment = self.get_object()
+        comments = list(thread_queryset(comment.article_id, root=comment))
+        serializer = self.get_serializer(comments, many=True)
+        return Response(build_tree(comments, serializer.data)[0])
+
+    @action(detail=True, methods=['GET'])
+    def replies(self, request, pk=None):
+        """
+        该评论的回复（不含自身），按路径分页，?cursor= 翻页；页内的回复组装为嵌套结构
+        """
+        comment = self.get_object()
+        paginator = ReplyPagination()
+        replies = paginator.paginate_queryset(
+            thread_queryset(comment.article_id, root=comment).exclude(pk=comment.pk),
+            request
+        )
+        serializer = self.get_serializer(replies, many=True)
+        return paginator.get_paginated_response(build_tree(replies, serializer.data))
@@ -0,0 +1,58 @@
+"""
+带缓存的 JWT 认证
+
+令牌签名已经校验过，每个请求仍要按 user_id 查询一次用户。
+这里把认证需要的少数字段（不含密码哈希）缓存在 Django 缓存中（settings.USER_CACHE_TIMEOUT 秒），
+读取时还原为只加载了这些字段的 User，其余字段在访问时再从数据库读取。
+
+用户保存（包括修改密码、停用）或删除时由 user_info.signals 删除缓存条目，
+但删除只对共享同一缓存的进程生效：默认的本地内存缓存每个进程一份，
+其他进程最多在缓存时长内仍使用旧数据，因此缓存时长应保持很短；
+需要立即失效时应将 CACHES 配置为 Redis / Memcached 等共享缓存。
+
+通过 QuerySet.update() 修改用户不会触发信号，同样最多在缓存时长内读到旧数据。
+"""
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+USER_CACHE_PREFIX = 'user_info:user:'
+# 认证与权限判断用到的字段
+CACHED_FIELDS = ('id', 'username', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return f'{USER_CACHE_PREFIX}{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    从缓存中读取令牌对应的用户，未命中时查询数据库并写入缓存
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        # from_db 要求字段按模型中的顺序排列
+        fields = [
+            field.attname for field in self.user_model._meta.concrete_fields
+            if field.attname in CACHED_FIELDS
+        ]
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            # 用户不存在或已停用时由父类抛出异常，不写入缓存
+            user = super().get_user(validated_token)
+            values = [getattr(user, field) for field in fields]
+            cache.set(key, values, getattr(settings, 'USER_CACHE_TIMEOUT', 10))
+            return user
+        return self.user_model.from_db('default', fields, values)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from user_info.stats import rebuild
+
+
+class Command(BaseCommand):
+    """
+    重新计算用户的活动统计
+    """
+    help = '从文章、点赞、评论表重新计算用户的文章数、收到的点赞数、评论数'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids',
+            nargs='*',
+            type=int,
+            help='只计算指定的用户，默认全部',
+        )
+
+    def handle(self, *args, **options):
+        updated = rebuild(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f'已重新计算 {updated} 个用户的统计'))
@@ -24,3 +24,18 @@ class AuthInfo(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.token}'
+
+
+class UserStats(models.Model):
+    """
+    用户的活动统计（发表的文章数、收到的点赞数、发表的评论数），由 user_info.stats 增量维护
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    article_count = models.PositiveIntegerField(default=0)
+    likes_received = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = ('article_count', 'likes_received', 'comment_count')
+
+    def __str__(self):
+        return f'{self.user_id} stats'
@@ -0,0 +1,24 @@
+"""
+用户列表分页，基于 article.pagination.KeysetPagination
+"""
+from article.pagination import KeysetPagination
+
+
+class UserPagination(KeysetPagination):
+    """
+    用户列表按 id 分页（主键索引）
+    """
+    ordering = ('id',)
+    page_size = 20
+
+
+class UsernamePagination(KeysetPagination):
+    """
+    按用户名分页，username 唯一且有索引，descending 为 True 时倒序
+    """
+    ordering = ('username',)
+    page_size = 20
+
+    def __init__(self, descending=False):
+        if descending:
+            self.ordering = ('-username',)
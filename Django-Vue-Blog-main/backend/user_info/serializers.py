@@ -1,6 +1,9 @@
 from user_info.models import User, AuthInfo
 from rest_framework import serializers
 
+from article.models import Article
+from user_info.stats import latest_articles
+
 
 class UserDescSerializer(serializers.ModelSerializer):
     """
@@ -50,6 +53,43 @@ class UserDetailSerializer(serializers.ModelSerializer):
             'is_superuser'
         ]
 
+class UserProfileArticleSerializer(serializers.ModelSerializer):
+    """
+    用户主页中的文章摘要
+    """
+
+    class Meta:
+        model = Article
+        fields = ['id', 'title', 'summary', 'created_at', 'likes_count', 'views_count', 'comments_count']
+
+
+class UserProfileSerializer(serializers.ModelSerializer):
+    """
+    用户主页：基本信息、活动统计（user_info.stats）和最新文章
+    """
+    article_count = serializers.IntegerField(source='stats.article_count', read_only=True)
+    likes_received = serializers.IntegerField(source='stats.likes_received', read_only=True)
+    comment_count = serializers.IntegerField(source='stats.comment_count', read_only=True)
+    latest_articles = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = [
+            'id',
+            'username',
+            'description',
+            'avatar',
+            'date_joined',
+            'article_count',
+            'likes_received',
+            'comment_count',
+            'latest_articles',
+        ]
+
+    def get_latest_articles(self, obj):
+        return UserProfileArticleSerializer(latest_articles(obj), many=True).data
+
+
 class AuthInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = AuthInfo
@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from article.models import Article, ArticleLike
+from article.signals import is_article_deletion
+from comment.models import Comment
+from user_info.authentication import invalidate_user
+from user_info.models import User, UserStats
+from user_info.stats import increment
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # 保存包括修改密码、停用、更新 last_login
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Article)
+def count_article(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(instance.author_id, 'article_count', 1)
+
+
+@receiver(pre_delete, sender=Article)
+def uncount_article(sender, instance, **kwargs):
+    # 在级联删除点赞之前统计，文章的点赞一次性从作者的统计中减去
+    likes = ArticleLike.objects.filter(article_id=instance.pk).count()
+    increment(instance.author_id, 'article_count', -1)
+    increment(instance.author_id, 'likes_received', -likes)
+
+
+@receiver(post_save, sender=ArticleLike)
+def count_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(instance.article.author_id, 'likes_received', 1)
+
+
+@receiver(post_delete, sender=ArticleLike)
+def uncount_like(sender, instance, origin=None, **kwargs):
+    # 删除文章时已在 uncount_article 中减去
+    if is_article_deletion(origin):
+        return
+    author_id = Article.objects.filter(pk=instance.article_id).values_list('author_id', flat=True).first()
+    increment(author_id, 'likes_received', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(instance.user_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    increment(instance.user_id, 'comment_count', -1)
@@ -0,0 +1,85 @@
+"""
+用户的活动统计
+
+发表的文章数、收到的点赞数、发表的评论数冗余保存在 UserStats 上，
+由 user_info.signals 在文章、点赞、评论创建和删除时通过 F() 增减，用户主页读取时不再 COUNT(*)。
+
+* 统计行在用户注册时创建；没有统计行的用户在第一次增加或读取时从源表计算
+* 修改文章作者、QuerySet.update() / bulk_create() 不会触发信号，用 rebuild_user_stats 命令校正
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from article.counters import add_expression, aggregate_subquery
+from article.models import Article, ArticleLike
+from comment.models import Comment
+from user_info.models import User, UserStats
+
+COUNTER_FIELDS = UserStats.COUNTER_FIELDS
+
+
+def latest_article_count():
+    """
+    用户主页展示的最新文章数
+    """
+    return getattr(settings, 'USER_PROFILE_ARTICLES', 5)
+
+
+def increment(user_id, field, amount=1):
+    """
+    原子地增减用户统计
+
+    统计行不存在时，增加会从源表计算整行（已包含本次变化）；减少则忽略，之后计算时自然正确。
+    删除用户时级联删除的记录也只会走到减少，不会为正在删除的用户重新创建统计行。
+    """
+    if field not in COUNTER_FIELDS:
+        raise ValueError(f'Unknown counter: {field}')
+    if not amount or user_id is None:
+        return
+    updated = UserStats.objects.filter(user_id=user_id).update(**{field: add_expression(field, amount)})
+    if not updated and amount > 0:
+        rebuild([user_id])
+
+
+def rebuild(user_ids=None):
+    """
+    从文章、点赞、评论表重新计算统计，缺少的统计行先创建，返回更新的行数
+    """
+    users = User.objects.all()
+    stats = UserStats.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        missing = users.filter(stats__isnull=True).values_list('pk', flat=True)
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk) for pk in missing.iterator()],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        return stats.update(
+            article_count=aggregate_subquery(Article, Count('pk'), field='author'),
+            likes_received=aggregate_subquery(ArticleLike, Count('pk'), field='article__author'),
+            comment_count=aggregate_subquery(Comment, Count('pk'), field='user'),
+        )
+
+
+def get_stats(user):
+    """
+    读取用户的统计行，不存在时先计算
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild([user.pk])
+        user.stats = UserStats.objects.get(user_id=user.pk)
+        return user.stats
+
+
+def latest_articles(user):
+    """
+    用户最新的文章，使用 (author, created_at, id) 索引
+    """
+    return Article.objects.filter(author=user).order_by('-created_at', '-id')[:latest_article_count()]
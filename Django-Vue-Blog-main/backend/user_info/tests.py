@@ -1,3 +1,233 @@
-from django.test import TestCase
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from article.models import ArticleLike
+from article.testcases import BlogTestCase
+from user_info import throttling
+from user_info.authentication import CachedJWTAuthentication
+from user_info.models import User, UserStats
+
+
+class CachedJWTAuthenticationTestCase(BlogTestCase):
+    """
+    令牌对应的用户缓存在 Django 缓存中，用户保存或删除后失效
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.users[0]
+        self.token = AccessToken.for_user(self.user)
+        self.authentication = CachedJWTAuthentication()
+
+    def get_user(self):
+        return self.authentication.get_user(self.token)
+
+    def test_cached(self):
+        with self.assertNumQueries(1):
+            self.get_user()
+        with self.assertNumQueries(0):
+            user = self.get_user()
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.username, self.user.username)
+            self.assertTrue(user.is_authenticated)
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_invalidated_on_save(self):
+        self.get_user()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.get_user()
+
+    def test_invalidated_on_delete(self):
+        self.get_user()
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.get_user()
+
+    def test_request(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        article = self.create_article()
+        url = f'/api/article/likes/?ids={article.pk}'
+        first = self.count_queries(url)
+        self.assertEqual(self.count_queries(url), first - 1)
+
+
+@override_settings(AUTH_THROTTLE={
+    'STORE': 'local',
+    'RATES': {'login_ip': '3/min', 'login_username': '2/min', 'register_ip': '2/hour'},
+})
+class ThrottleTestCase(BlogTestCase):
+    """
+    登录、获取令牌和注册按令牌桶限流，被拒绝的请求不做密码校验
+    """
+
+    def setUp(self):
+        super().setUp()
+        throttling._store = None
+        self.addCleanup(setattr, throttling, '_store', None)
+
+    def login(self, username, address='10.0.0.1', url='/api/login/', **extra):
+        return self.client.post(
+            url, {'username': username, 'password': 'wrong'}, REMOTE_ADDR=address, **extra
+        )
+
+    def test_username(self):
+        self.assertEqual(self.login('user0', '10.0.0.1').status_code, 401)
+        self.assertEqual(self.login('USER0 ', '10.0.0.2').status_code, 401)
+        with mock.patch.object(User, 'check_password') as check_password:
+            response = self.login('user0', '10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        check_password.assert_not_called()
+
+    def test_ip_ignores_forwarded_for(self):
+        statuses = [
+            self.login(f'user{i}', HTTP_X_FORWARDED_FOR=f'192.168.0.{i}').status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        self.assertEqual(self.login('other', '10.0.0.2').status_code, 401)
+
+    def test_ip_behind_proxy(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            statuses = [
+                self.login(f'user{i}', HTTP_X_FORWARDED_FOR=f'192.168.0.{i % 2}').status_code
+                for i in range(6)
+            ]
+        self.assertEqual(statuses, [401] * 6)
+
+    def test_token_shares_limits(self):
+        self.assertEqual(self.login('user0').status_code, 401)
+        self.assertEqual(self.login('user0', url='/api/token/').status_code, 401)
+        self.assertEqual(self.login('user0', url='/api/token/').status_code, 429)
+
+    def test_register(self):
+        statuses = [
+            self.client.post('/api/user/', {}, REMOTE_ADDR='10.0.0.1').status_code
+            for _ in range(3)
+        ]
+        self.assertEqual(statuses, [400, 400, 429])
+
+    def test_refill(self):
+        store = throttling.LocalBucketStore(max_entries=10)
+        rate = throttling.parse_rate('2/min')
+        with mock.patch.object(throttling.time, 'monotonic', return_value=0):
+            self.assertEqual([store.take('key', *rate)[0] for _ in range(3)], [True, True, False])
+            self.assertEqual(store.take('key', *rate), (False, 30))
+        with mock.patch.object(throttling.time, 'monotonic', return_value=30):
+            self.assertEqual(store.take('key', *rate), (True, 0))
+
+    @override_settings(AUTH_THROTTLE={'STORE': 'django', 'RATES': {'login_username': '1/min'}})
+    def test_cache_store(self):
+        self.assertEqual(self.login('user0', '10.0.0.1').status_code, 401)
+        self.assertEqual(self.login('user0', '10.0.0.2').status_code, 429)
+        self.assertIsInstance(throttling.get_store(), throttling.CacheBucketStore)
+
+
+class UserDirectoryTestCase(BlogTestCase):
+    """
+    用户列表按游标分页，用户名前缀查找走索引且转义通配符
+    """
+
+    def setUp(self):
+        super().setUp()
+        for username in ('alice', 'Bob', 'user_a'):
+            User.objects.create_user(username=username, password='password')
+
+    def collect(self, url):
+        usernames = []
+        while url:
+            data = self.client.get(url).json()
+            usernames.extend(user['username'] for user in data['results'])
+            url = data['next']
+        return usernames
+
+    def test_list(self):
+        self.assertEqual(
+            self.collect('/api/user/?page_size=2'),
+            list(User.objects.order_by('id').values_list('username', flat=True))
+        )
+        self.assertConstantQueries(
+            '/api/user/',
+            lambda: [User.objects.create_user(username=f'more{i}') for i in range(5)]
+        )
+
+    def test_sorted(self):
+        self.assertEqual(
+            self.collect('/api/user/sorted/?page_size=2'),
+            list(User.objects.order_by('-username').values_list('username', flat=True))
+        )
+
+    def test_lookup(self):
+        self.assertEqual(
+            self.collect('/api/user/lookup/?prefix=USER&page_size=2'),
+            ['user0', 'user1', 'user2', 'user_a']
+        )
+        self.assertEqual(self.collect('/api/user/lookup/?prefix=user_'), ['user_a'])
+        self.assertEqual(self.collect('/api/user/lookup/?prefix=b'), ['Bob'])
+        self.assertEqual(self.collect('/api/user/lookup/?prefix=%25'), [])
+        self.assertEqual(self.collect(f'/api/user/lookup/?prefix={"a" * 200}'), [])
+
+    def test_lookup_requires_prefix(self):
+        self.assertEqual(self.client.get('/api/user/lookup/').status_code, 400)
+        self.assertEqual(self.client.get('/api/user/lookup/?prefix=%20').status_code, 400)
+
+
+@override_settings(USER_PROFILE_ARTICLES=2)
+class UserProfileTestCase(BlogTestCase):
+    """
+    用户主页的统计随文章、点赞、评论增减，读取时不做计数查询
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.users[0]
+        self.url = f'/api/user/{self.author.username}/profile/'
+        self.articles = [self.create_article(title=f'title {i}') for i in range(3)]
+        for user in self.users[1:]:
+            ArticleLike.objects.create(article=self.articles[0], user=user)
+        ArticleLike.objects.create(article=self.articles[1], user=self.users[1])
+        self.create_comments(self.articles[0], 3)
+
+    def stats(self):
+        data = self.client.get(self.url).json()
+        return data['article_count'], data['likes_received'], data['comment_count']
+
+    def test_profile(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['article_count'], data['likes_received'], data['comment_count']), (3, 3, 1))
+        self.assertEqual(
+            [article['title'] for article in data['latest_articles']],
+            ['title 2', 'title 1']
+        )
+        self.assertEqual(self.client.get('/api/user/nobody/profile/').status_code, 404)
+
+    def test_delete(self):
+        self.articles[0].delete()
+        self.assertEqual(self.stats(), (2, 1, 0))
+        ArticleLike.objects.filter(article=self.articles[1]).delete()
+        self.assertEqual(self.stats(), (2, 0, 0))
+
+    def test_missing_stats_row(self):
+        UserStats.objects.filter(user=self.author).delete()
+        self.assertEqual(self.stats(), (3, 3, 1))
+        self.assertTrue(UserStats.objects.filter(user=self.author).exists())
+
+    def test_rebuild_command(self):
+        UserStats.objects.update(article_count=0, likes_received=0, comment_count=0)
+        call_command('rebuild_user_stats', self.author.pk, stdout=io.StringIO())
+        self.assertEqual(self.stats(), (3, 3, 1))
+        self.assertEqual(UserStats.objects.get(user=self.users[1]).comment_count, 0)
+
+    def test_constant_queries(self):
+        self.assertConstantQueries(
+            self.url,
+            lambda: [self.create_article(title=f'more {i}') for i in range(5)]
+        )
@@ -0,0 +1,174 @@
+"""
+登录与注册限流
+
+密码哈希（PBKDF2）刻意很慢，大量错误登录会占满所有 worker。
+DRF 在调用视图方法之前检查限流，被拒绝的请求不会进行任何哈希计算。
+
+令牌桶：每个键最多积累 N 个令牌，按 N / 周期 的速度补充，每次请求消耗一个，
+允许短时间的突发，同时限制长期速率。速率在 settings.AUTH_THROTTLE['RATES'] 中配置，
+格式与 DRF 相同（如 '5/min'），值为 None 表示不限制。
+
+* STORE 为 local 时桶保存在进程内的有界 LRU 中，每个进程单独计数
+* STORE 为 django 时保存在 Django 缓存中，多进程共享（读写非原子，并发时可能多放行少量请求）
+
+按 IP 限流使用 REMOTE_ADDR。客户端可以任意伪造 X-Forwarded-For，只有在 REST_FRAMEWORK
+中配置了 NUM_PROXIES（部署在反向代理之后）时，才按 DRF 的规则从中取出代理之前的地址。
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from article.lru import LRUCache
+
+CACHE_PREFIX = 'user_info:throttle:'
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+DEFAULT_SETTINGS = {
+    'STORE': 'local',         # local: 进程内 LRU；django: Django 缓存
+    'CACHE_ALIAS': 'default',
+    'MAX_ENTRIES': 10000,
+    'RATES': {
+        'login_ip': '20/min',
+        'login_username': '5/min',
+        'register_ip': '10/hour',
+    },
+}
+
+
+def get_settings():
+    config = {**DEFAULT_SETTINGS, **getattr(settings, 'AUTH_THROTTLE', {})}
+    config['RATES'] = {**DEFAULT_SETTINGS['RATES'], **config['RATES']}
+    return config
+
+
+def parse_rate(rate):
+    """
+    '5/min' -> (容量 5, 每秒补充 5 / 60)
+    """
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+def refill(state, capacity, refill_rate, now):
+    tokens, updated = state if state else (capacity, now)
+    return min(capacity, tokens + (now - updated) * refill_rate)
+
+
+class LocalBucketStore:
+    """
+    进程内的令牌桶
+    """
+
+    def __init__(self, max_entries):
+        self._buckets = LRUCache(maxsize=max_entries)
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate):
+        """
+        取一个令牌，返回 (是否允许, 需要等待的秒数)
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens = refill(self._buckets.get(key), capacity, refill_rate, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets.set(key, (tokens, now))
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+
+class CacheBucketStore:
+    """
+    保存在 Django 缓存中的令牌桶，条目在桶补满后过期
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def take(self, key, capacity, refill_rate):
+        cache = caches[self.alias]
+        now = time.time()
+        tokens = refill(cache.get(CACHE_PREFIX + key), capacity, refill_rate, now)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        cache.set(CACHE_PREFIX + key, (tokens, now), int(capacity / refill_rate) + 1)
+        return allowed, 0 if allowed else (1 - tokens) / refill_rate
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        config = get_settings()
+        if config['STORE'] == 'django':
+            _store = CacheBucketStore(config['CACHE_ALIAS'])
+        else:
+            _store = LocalBucketStore(config['MAX_ENTRIES'])
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    令牌桶限流，子类设置 scope 并实现 get_key(request)，返回 None 表示不限制该请求
+    """
+    scope = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        rate = parse_rate(get_settings()['RATES'].get(self.scope))
+        key = self.get_key(request)
+        if rate is None or key is None:
+            return True
+        allowed, self.wait_seconds = get_store().take(f'{self.scope}:{key}', *rate)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ClientIPThrottle(TokenBucketThrottle):
+    """
+    按客户端 IP 限流
+    """
+
+    def get_key(self, request):
+        if api_settings.NUM_PROXIES is not None:
+            return self.get_ident(request)
+        return request.META.get('REMOTE_ADDR')
+
+
+class LoginIPThrottle(ClientIPThrottle):
+    scope = 'login_ip'
+
+
+class LoginUsernameThrottle(TokenBucketThrottle):
+    """
+    按用户名限流，防止分散在多个 IP 上针对同一账号的猜测
+    """
+    scope = 'login_username'
+
+    def get_key(self, request):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        return username.strip().lower()
+
+
+class RegisterIPThrottle(ClientIPThrottle):
+    scope = 'register_ip'
+
+
+LOGIN_THROTTLES = [LoginIPThrottle, LoginUsernameThrottle]
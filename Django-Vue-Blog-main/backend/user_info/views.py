@@ -3,17 +3,23 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 
 from user_info.models import User, AuthInfo
 from user_info.serializers import (
     UserRegisterSerializer,
     UserDetailSerializer,
     UserDescSerializer,
+    UserProfileSerializer,
     AuthInfoSerializer
 )
+from user_info.pagination import UserPagination, UsernamePagination
 from user_info.permissions import IsSelfOrReadOnly
+from user_info.stats import get_stats
+from user_info.throttling import LOGIN_THROTTLES, RegisterIPThrottle
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -23,6 +29,13 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserDetailSerializer
     lookup_field = 'username'
+    pagination_class = UserPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'profile':
+            queryset = queryset.select_related('stats')
+        return queryset
 
     def get_serializer_class(self):
         """
@@ -39,6 +52,14 @@ class UserViewSet(viewsets.ModelViewSet):
             self.permission_classes = [IsAuthenticatedOrReadOnly, IsSelfOrReadOnly]
 
         return super().get_permissions()
+
+    def get_throttles(self):
+        """
+        注册按 IP 限流，在序列化器校验和密码哈希之前拒绝
+        """
+        if self.action == 'create':
+            return [RegisterIPThrottle()]
+        return super().get_throttles()
     
     @action(detail=True, methods=['get'])
     def info(self, request, username=None):
@@ -46,19 +67,50 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = UserDetailSerializer(queryset, many=False)
         return Response(serializer.data)
     
-    @action(detail=False)
-    def sorted(self, reqeust):
-        users = User.objects.all().order_by('-username')
-        page = self.paginate_queryset(users)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        
-        serializer = self.get_serializer(users, many=True)
+    @action(detail=True)
+    def profile(self, request, username=None):
+        """
+        用户主页：活动统计和最新文章，统计读取 UserStats，不做计数查询
+        """
+        user = self.get_object()
+        get_stats(user)
+        serializer = UserProfileSerializer(user)
         return Response(serializer.data)
 
+    @action(detail=False)
+    def sorted(self, request):
+        """
+        按用户名倒序分页
+        """
+        paginator = UsernamePagination(descending=True)
+        page = paginator.paginate_queryset(User.objects.all(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def lookup(self, request):
+        """
+        按用户名前缀查找（@ 提及自动补全），不区分大小写，按用户名顺序分页
+
+        前缀匹配为 LIKE 'xxx%'，可以使用 username 的唯一索引（MySQL 默认排序规则不区分大小写）
+        """
+        prefix = request.query_params.get('prefix', '').strip()
+        if not prefix:
+            raise ValidationError({'prefix': '请提供用户名前缀'})
+        max_length = User._meta.get_field('username').max_length
+        if len(prefix) > max_length:
+            return Response({'next': None, 'previous': None, 'results': []})
+
+        paginator = UsernamePagination()
+        page = paginator.paginate_queryset(
+            User.objects.filter(username__istartswith=prefix), request, view=self
+        )
+        serializer = UserDescSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = LOGIN_THROTTLES
     
     def post(self, request):
         username = request.data.get('username')
@@ -78,6 +130,12 @@ class LoginView(APIView):
             'access': str(refresh.access_token),
         })
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """
+    获取令牌，与登录使用相同的限流
+    """
+    throttle_classes = LOGIN_THROTTLES
+
 class AuthInfoViewSet(viewsets.ModelViewSet):
     queryset = AuthInfo.objects.all()
     serializer_class = AuthInfoSerializer